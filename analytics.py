@@ -0,0 +1,207 @@
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from fsm import FSM
+from transcript import SQLiteSink, JSONLSink
+
+# Reply types that answer the user's question
+ANSWER_TYPES = {
+    "courses", "faculty", "prerequisites", "calendar", "faq",
+    "event", "events", "gpa", "internships", "composite", "timetable", "search", "reminder", "recommendation",
+}
+ONBOARDING_TYPES = {"ask_name", "ask_dept", "welcome"}
+
+
+class SQLiteSource:
+    """Reads turns from the SQLite transcript, resuming after the last row id."""
+
+    def __init__(self, path):
+        self.path = path
+        self.last_id = 0
+
+    def read_new(self):
+        if not os.path.exists(self.path):
+            return
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                "SELECT id, ts, session_id, message, fsm_state, pda_stack, reply_type, latency_ms, status "
+                "FROM turns WHERE id > ? ORDER BY id",
+                (self.last_id,),
+            )
+            for row in rows:
+                self.last_id = row[0]
+                yield {
+                    "ts": row[1], "session_id": row[2], "message": row[3], "fsm_state": row[4],
+                    "pda_stack": json.loads(row[5]) if row[5] else [],
+                    "reply_type": row[6], "latency_ms": row[7], "status": row[8],
+                }
+        except sqlite3.OperationalError:
+            return  # Table not created yet
+        finally:
+            conn.close()
+
+
+class JSONLSource:
+    """Reads finished JSONL segments, each segment exactly once."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.seen = set()
+
+    def read_new(self):
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl.gz"))):
+            if path in self.seen:
+                continue
+            self.seen.add(path)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+def hour_key(ts):
+    return time.strftime("%Y-%m-%d %H:00", time.localtime(ts))
+
+
+class Rollups:
+    """
+    Incremental rollups over the turn log.
+    Each call to update() folds in only the turns it is given, so the
+    source can hand over new rows or segments without a rescan.
+    """
+
+    def __init__(self, states=FSM.STATES, session_ttl=3600):
+        self.states = list(states)
+        self.state_index = {s: i for i, s in enumerate(self.states)}
+        self.transitions = np.zeros((len(self.states), len(self.states)), dtype=np.int64)
+        self.intents_per_hour = defaultdict(Counter)   # "YYYY-mm-dd HH:00" -> state -> count
+        self.reply_types = Counter()
+        self.turns = 0
+        self.fallbacks = 0
+        self.resolutions = 0
+        self.turns_to_resolution = 0
+        self.fallback_streaks = Counter()                # streak length -> count
+        self.reprompts = Counter()                       # context -> count
+        self.abandoned = Counter()                       # context -> count
+        self.sessions = {}                               # session id -> open session state
+        self.session_ttl = session_ttl
+
+    def update(self, turns):
+        for turn in turns:
+            self._add(turn)
+        self._expire()
+
+    def _add(self, turn):
+        reply_type = turn.get("reply_type")
+        # The goodbye turn clears the session, so its logged state is START
+        state = "GOODBYE" if reply_type == "goodbye" else turn.get("fsm_state") or "START"
+        ts = turn.get("ts") or time.time()
+        stack = turn.get("pda_stack") or []
+
+        self.turns += 1
+        self.reply_types[reply_type] += 1
+        self.intents_per_hour[hour_key(ts)][state] += 1
+
+        sid = turn.get("session_id")
+        sess = self.sessions.setdefault(sid, {"state": "START", "pending": 0, "streak": 0, "top": None, "ts": ts})
+        sess["ts"] = ts
+
+        if state in self.state_index:
+            self.transitions[self.state_index[sess["state"]], self.state_index[state]] += 1
+            sess["state"] = state
+
+        if reply_type == "fallback":
+            self.fallbacks += 1
+            sess["streak"] += 1
+        else:
+            self._close_streak(sess)
+
+        if reply_type == "reprompt" and sess["top"]:
+            self.reprompts[sess["top"]] += 1
+
+        if reply_type in ANSWER_TYPES:
+            self.resolutions += 1
+            self.turns_to_resolution += sess["pending"] + 1
+            sess["pending"] = 0
+        elif reply_type not in ONBOARDING_TYPES:
+            sess["pending"] += 1
+
+        if reply_type == "goodbye":
+            if sess["top"] and sess["top"].startswith("NEED_"):
+                self.abandoned[sess["top"]] += 1
+            del self.sessions[sid]
+        else:
+            sess["top"] = stack[-1] if stack else None
+
+    def _close_streak(self, sess):
+        if sess["streak"] >= 2:
+            self.fallback_streaks[sess["streak"]] += 1
+        sess["streak"] = 0
+
+    def _expire(self):
+        """Sessions idle past the TTL count as abandoned if a context was open."""
+        cutoff = time.time() - self.session_ttl
+        for sid in [sid for sid, sess in self.sessions.items() if sess["ts"] < cutoff]:
+            sess = self.sessions.pop(sid)
+            self._close_streak(sess)
+            if sess["top"] and sess["top"].startswith("NEED_"):
+                self.abandoned[sess["top"]] += 1
+
+    def summary(self, hours=24, now=None):
+        # Hour buckets overlapping the last `hours` hours; the keys sort by time
+        since = hour_key((now or time.time()) - hours * 3600)
+        recent = sorted(hour for hour in self.intents_per_hour if hour >= since)
+        return {
+            "turns": self.turns,
+            "fallback_rate": round(self.fallbacks / self.turns, 4) if self.turns else 0.0,
+            "avg_turns_to_resolution": (
+                round(self.turns_to_resolution / self.resolutions, 3) if self.resolutions else None
+            ),
+            "reply_types": dict(self.reply_types),
+            "intents_per_hour": {hour: dict(self.intents_per_hour[hour]) for hour in recent},
+            "fallback_streaks": {str(k): v for k, v in sorted(self.fallback_streaks.items())},
+            "reprompts": dict(self.reprompts),
+            "abandoned_contexts": dict(self.abandoned),
+            "open_sessions": len(self.sessions),
+            "transition_matrix": {
+                "states": self.states,
+                "counts": self.transitions.tolist(),
+            },
+        }
+
+
+class Analytics:
+    """Pairs a log source with rollups and refreshes them on demand."""
+
+    def __init__(self, source):
+        self.source = source
+        self.rollups = Rollups()
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        with self.lock:
+            self.rollups.update(self.source.read_new())
+
+    def summary(self, hours=24):
+        self.refresh()
+        with self.lock:
+            return self.rollups.summary(hours)
+
+
+def make_analytics(logger):
+    """Build analytics reading from wherever the transcript logger writes."""
+    if logger is None:
+        return None
+    if isinstance(logger.sink, SQLiteSink):
+        return Analytics(SQLiteSource(logger.sink.path))
+    if isinstance(logger.sink, JSONLSink):
+        return Analytics(JSONLSource(logger.sink.directory))
+    return None
@@ -1,10 +1,35 @@
-from flask import Flask, render_template, request, jsonify, session
-from fsm import FSM
-from pda import PDA
+from flask import Flask, render_template, request, jsonify, session, g, url_for
+from markupsafe import escape
+from fsm import FSM, CLAUSE_SPLIT
+import codec
+from timetable import DAY_NAMES, IntervalTree, Timetable, build_timetable, format_minutes
+from ratelimit import RateLimiter, AdmissionController, make_store, retry_after_header
+from transcript import make_logger
+from analytics import make_analytics
+from autocomplete import PrefixIndex, build_index
+from search import build_documents, build_search_index, parse_query, tokenize
+from bundle import PATTERNS, faq_patterns, make_bundle
+from reminders import make_scheduler
+from recommend import build_recommender
+from assets import compress_variants, load_assets, negotiate
+from shadow import make_evaluator
+from checkpoints import make_checkpoints
+import hashlib
+import hmac
 import json
-import random
+import os
 import re
+import secrets
+import threading
+import time
+import uuid
 from datetime import datetime
+from types import MappingProxyType
+
+try:
+    from flask_sock import Sock, ConnectionClosed
+except ImportError:  # WebSocket transport is optional, HTTP keeps working
+    Sock = None
 
 app = Flask(__name__)
 app.secret_key = "chatbot_secret_key_2025"
@@ -22,27 +47,38 @@ TEXT_COLOR = "#e5e7eb"       # Main text
 SUBTEXT_COLOR = "#94a3b8"    # Muted text
 
 
-def get_fsm_from_session():
-    """Retrieve FSM from session or create a new one."""
-    fsm = FSM()
-    fsm.state = session.get('fsm_state', 'START')
-    return fsm
-
-def save_fsm_to_session(fsm):
-    """Save FSM state to session."""
-    session['fsm_state'] = fsm.state
-
-def get_pda_from_session():
-    """Retrieve PDA from session or create a new one."""
-    pda = PDA()
-    pda.stack = session.get('pda_stack', [])
-    pda.history = session.get('pda_history', [])
-    return pda
-
-def save_pda_to_session(pda):
-    """Save PDA state to session."""
-    session['pda_stack'] = pda.stack
-    session['pda_history'] = pda.history
+def load_conversation(store=None):
+    """
+    Retrieve FSM, PDA and the stack last shown by the PDA monitor from the
+    session (or another store). Returns (fsm, pda, previous_stack).
+    """
+    store = session if store is None else store
+    try:
+        return codec.decode(store.get('state'))
+    except ValueError:
+        # Unreadable state (e.g. an older format), start a fresh conversation
+        return codec.decode(None)
+
+def save_conversation(fsm, pda, previous_stack=(), store=None):
+    """Save FSM and PDA to the session as one binary blob (see codec.py)."""
+    store = session if store is None else store
+    store['state'] = codec.encode(fsm, pda, previous_stack)
+
+def stack_operation(previous_stack, current_stack):
+    """Describe the PUSH/POP between two PDA stack snapshots."""
+    if len(current_stack) > len(previous_stack):
+        pushed_item = current_stack[-1] if current_stack else None
+        if pushed_item:
+            return {'type': 'push', 'text': f'PUSH: {pushed_item}'}
+    elif len(current_stack) < len(previous_stack):
+        popped_item = None
+        for i in range(len(previous_stack)-1, -1, -1):
+            if i >= len(current_stack) or previous_stack[i] != current_stack[i]:
+                popped_item = previous_stack[i]
+                break
+        if popped_item:
+            return {'type': 'pop', 'text': f'POP: {popped_item}'}
+    return None
 
 # -------------------
 # Data Extraction Functions
@@ -119,6 +155,48 @@ def extract_course_code(text):
                 return course['code']
     return None
 
+def extract_course_codes(text):
+    """Extract every known course code mentioned, in order."""
+    codes = []
+    for code in re.findall(r'\b[A-Z]{3}\s?\d{3}\b', text.upper()):
+        code = code.replace(" ", "")
+        if code in DATA["PREREQUISITES"] and code not in codes:
+            codes.append(code)
+    return codes
+
+def extract_day(text):
+    """Extract a weekday ('Tuesday', 'tue') from text."""
+    for word in re.findall(r'[a-z]+', text.lower()):
+        if word in DAY_NAMES:
+            return DAY_NAMES[word]
+    return None
+
+def extract_time_range(text):
+    """Extract a time window like '2-4pm' or '14:00 to 16:30' as minutes."""
+    match = re.search(
+        r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s*(?:-|–|to|until)\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)?',
+        text.lower()
+    )
+    if not match:
+        return None
+    start_h, start_m, start_ap, end_h, end_m, end_ap = match.groups()
+    # '2-4pm' shares the end's am/pm
+    start_ap = start_ap or (end_ap if end_ap and int(start_h) <= int(end_h) else None)
+
+    def to_minutes(hour, minute, ampm):
+        hour = int(hour) % 24
+        if ampm == "pm" and hour < 12:
+            hour += 12
+        elif ampm == "am" and hour == 12:
+            hour = 0
+        elif ampm is None and 1 <= hour <= 7:
+            hour += 12  # No classes before 8 AM, '2-4' means afternoon
+        return hour * 60 + int(minute or 0)
+
+    start = to_minutes(start_h, start_m, start_ap)
+    end = to_minutes(end_h, end_m, end_ap)
+    return (start, end) if start < end else None
+
 # -------------------
 # NEW: Prerequisites & Calendar Functions
 # -------------------
@@ -464,6 +542,131 @@ def get_semester_faculty(semester):
     response += "</tbody></table>"
     return response
 
+def format_clash(course_a, course_b):
+    """Say whether two courses clash, section by section."""
+    timetable = DATA["TIMETABLE"]
+    missing = [code for code in (course_a, course_b) if code not in timetable.sections]
+    if missing:
+        return f"Sorry, there is no timetable yet for {', '.join(missing)}."
+
+    clashes = timetable.clashes(course_a, course_b)
+    total_pairs = len(timetable.sections[course_a]) * len(timetable.sections[course_b])
+    if not clashes:
+        return f"✅ <strong>{course_a}</strong> and <strong>{course_b}</strong> never clash. You can take them together."
+
+    response = f"<strong>{course_a}</strong> vs <strong>{course_b}</strong>:<br><br>"
+    for (section_a, section_b), pairs in sorted(clashes.items()):
+        response += f"⚠️ Section {section_a} and Section {section_b} clash:<br>"
+        for slot_a, slot_b in pairs:
+            response += (
+                f"• {slot_a['day']} {format_minutes(slot_a['start'])}–{format_minutes(slot_a['end'])} ({slot_a['room']})"
+                f" overlaps {format_minutes(slot_b['start'])}–{format_minutes(slot_b['end'])} ({slot_b['room']})<br>"
+            )
+    if len(clashes) < total_pairs:
+        response += "<br>✅ Other section combinations do not clash."
+    return response
+
+def format_free_time(day, start, end):
+    """Rooms free and classes running in a window of one day."""
+    timetable = DATA["TIMETABLE"]
+    window = f"{day} {format_minutes(start)}–{format_minutes(end)}"
+    busy = sorted(timetable.busy(day, start, end), key=lambda slot: slot['start'])
+    free_rooms = timetable.free_rooms(day, start, end)
+
+    response = f"<strong>{window}</strong><br><br>"
+    response += f"🏫 <strong>Free rooms:</strong> {', '.join(free_rooms) if free_rooms else 'None'}<br><br>"
+    if not busy:
+        response += "✅ No classes are scheduled in this window."
+        return response
+    response += "📚 <strong>Classes in this window:</strong><br>"
+    for slot in busy:
+        response += (
+            f"• <strong>{slot['course']}</strong> ({slot['section']}) "
+            f"{format_minutes(slot['start'])}–{format_minutes(slot['end'])}, {slot['room']}<br>"
+        )
+    return response
+
+def format_clash_free_schedule(semester):
+    """Pick a clash-free section for every course in a semester."""
+    courses = DATA["COURSES"].get(semester, [])
+    if not courses:
+        return None
+    timetable = DATA["TIMETABLE"]
+    chosen, unscheduled = timetable.build_schedule([course['code'] for course in courses])
+
+    response = f"<strong style='color:{HEADER_TEXT};'>Clash-free Schedule: Semester {semester}</strong><br><br>"
+    response += f"""
+    <table style="width:100%; border-collapse:collapse; background:{ROW_BG_1}; color:{TEXT_COLOR};">
+    <thead>
+        <tr style="background:{HEADER_BG}; color:{HEADER_TEXT};">
+            <th style="border:1px solid {BORDER_COLOR}; padding:12px;">Code</th>
+            <th style="border:1px solid {BORDER_COLOR}; padding:12px;">Section</th>
+            <th style="border:1px solid {BORDER_COLOR}; padding:12px;">Meetings</th>
+        </tr>
+    </thead><tbody>
+    """
+    for i, (code, section) in enumerate(sorted(chosen.items())):
+        bg = ROW_BG_1 if i % 2 == 0 else ROW_BG_2
+        meetings = "<br>".join(
+            f"{slot['day']} {format_minutes(slot['start'])}–{format_minutes(slot['end'])} ({slot['room']})"
+            for slot in timetable.sections[code][section]
+        )
+        response += f"""
+        <tr style="background:{bg};">
+            <td style="border:1px solid {BORDER_COLOR}; padding:10px; color:{HEADER_TEXT};"><b>{code}</b></td>
+            <td style="border:1px solid {BORDER_COLOR}; padding:10px; text-align:center;">{section}</td>
+            <td style="border:1px solid {BORDER_COLOR}; padding:10px; color:{SUBTEXT_COLOR};">{meetings}</td>
+        </tr>
+        """
+    response += "</tbody></table>"
+
+    unlisted = [course['code'] for course in courses if course['code'] not in timetable.sections]
+    if unscheduled:
+        response += f"<br>⚠️ <em>No clash-free section found for: {', '.join(unscheduled)}</em>"
+    if unlisted:
+        response += f"<br>ℹ️ <em>Not on the timetable yet: {', '.join(unlisted)}</em>"
+    return response
+
+def format_search_results(query):
+    """Ranked catalogue search results for a 'search X' message."""
+    text, filters = parse_query(query)
+    results = SEARCH.search(text, filters, limit=8)
+    if not results:
+        return f"No results found for '{escape(query)}'."
+
+    icons = {"course": "📚", "faculty": "👨‍🏫", "event": "🎉", "calendar": "📅", "faq": "ℹ️"}
+    response = f"<strong>Search results for '{escape(query)}':</strong><br><br>"
+    for score, doc in results:
+        response += f"{icons.get(doc['type'], '•')} <strong>{doc['title']}</strong>"
+        response += f" <small style='color:{SUBTEXT_COLOR};'>({doc['type']})</small><br>"
+        if doc['type'] == 'faq':
+            response += f"  {doc['text']}<br>"
+        response += "<br>"
+    return response
+
+def extract_search_query(text):
+    """'search data structures' -> 'data structures', else None."""
+    match = re.match(r'\s*(?:search|find|look up|lookup)\s+(?:for\s+)?(.+)', text, re.IGNORECASE)
+    return match.group(1).strip() if match else None
+
+def answer_timetable(text):
+    """Answer clash, free-time and schedule-building questions, or None."""
+    text_lower = text.lower()
+    semester = extract_semester_number(text)
+    if semester and any(word in text_lower for word in ["clash-free", "clash free", "build", "timetable", "schedule"]):
+        return format_clash_free_schedule(semester)
+
+    codes = extract_course_codes(text)
+    if len(codes) >= 2 and ("clash" in text_lower or "conflict" in text_lower or "overlap" in text_lower):
+        return format_clash(codes[0], codes[1])
+
+    day = extract_day(text)
+    window = extract_time_range(text)
+    if day and "free" in text_lower:
+        start, end = window or (8 * 60, 18 * 60)
+        return format_free_time(day, start, end)
+    return None
+
 def format_gpa_info():
     """Format GPA calculation info."""
     response = "🎓 <strong>GPA Calculator Guide:</strong><br><br>"
@@ -499,18 +702,40 @@ def generate_greeting():
     return "Welcome to University Chatbot👋"
 
 
+GOODBYES = (
+    "Goodbye! Have a great day! 👋",
+    "See you later! Feel free to come back anytime.",
+    "Bye! Good luck with your studies!",
+    "Take care! Let me know if you need help again."
+)
+
 def generate_goodbye():
-    goodbyes = [
-        "Goodbye! Have a great day! 👋",
-        "See you later! Feel free to come back anytime.",
-        "Bye! Good luck with your studies!",
-        "Take care! Let me know if you need help again."
-    ]
-    return random.choice(goodbyes)
+    # secrets draws from the OS, no generator state shared between threads
+    return secrets.choice(GOODBYES)
 
 # -------------------
 # Load Data
 # -------------------
+# Index objects whose containers freeze() replaces with read-only ones;
+# their methods only read them once built
+FROZEN_CLASSES = (Timetable, IntervalTree, PrefixIndex)
+
+def freeze(value):
+    """
+    Read-only deep copy: dicts become MappingProxyType, lists tuples, sets
+    frozensets. FROZEN_CLASSES instances are frozen in place.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    if isinstance(value, FROZEN_CLASSES):
+        for name, item in vars(value).items():
+            setattr(value, name, freeze(item))
+    return value
+
 def load_data():
     """Loads real university data for the chatbot."""
     courses_raw = [
@@ -729,6 +954,88 @@ def load_data():
         {"id": 5, "name": "Guest Lecture: Cybersecurity", "description": "Industry expert session", "date": "2026-03-25", "time": "11:00 AM"}
     ]
     
+    # NEW: Weekly timetable (course, section, days, start, end, room)
+    timetable_raw = [
+        # Semester 1
+        ('CSC101', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 101'),
+        ('CSC101', 'A', 'Sat', '08:30', '11:30', 'Lab 1'),
+        ('CSC102', 'A', 'Tue/Thu', '10:00', '11:30', 'Room 101'),
+        ('CSC102', 'A', 'Sat', '11:30', '14:30', 'Lab 1'),
+        ('ASC116', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 101'),
+        ('HSC121', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 101'),
+        ('HSC102', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 101'),
+        # Semester 2
+        ('CSC103', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 102'),
+        ('CSC103', 'A', 'Fri', '08:30', '11:30', 'Lab 1'),
+        ('CSC108', 'A', 'Tue/Thu', '10:00', '11:30', 'Room 102'),
+        ('CSC111', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 102'),
+        ('CSC111', 'A', 'Fri', '11:30', '14:30', 'Lab 1'),
+        ('ASC111', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 102'),
+        ('HSC111', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 102'),
+        ('HSC105', 'A', 'Tue/Thu', '16:00', '17:30', 'Room 102'),
+        # Semester 3
+        ('CSC201', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 103'),
+        ('CSC201', 'A', 'Sat', '08:30', '11:30', 'Lab 2'),
+        ('CSC202', 'A', 'Tue/Thu', '10:00', '11:30', 'Room 103'),
+        ('CSC202', 'A', 'Sat', '11:30', '14:30', 'Lab 2'),
+        ('ASC112', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 103'),
+        ('HSC211', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 103'),
+        ('CSE101', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 103'),
+        # Semester 4
+        ('CSC203', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 104'),
+        ('CSC203', 'A', 'Fri', '08:30', '11:30', 'Lab 2'),
+        ('CSC204', 'A', 'Tue/Thu', '10:00', '11:30', 'Room 104'),
+        ('CSC204', 'A', 'Fri', '11:30', '14:30', 'Lab 2'),
+        ('CSC206', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 104'),
+        ('CIC201', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 104'),
+        ('ASC202', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 104'),
+        # Semester 5
+        ('CNS301', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 105'),
+        ('CNS301', 'A', 'Sat', '08:30', '11:30', 'Lab 3'),
+        ('CSC205', 'A', 'Tue/Thu', '10:00', '11:30', 'Room 105'),
+        ('ASC201', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 105'),
+        ('CSC304', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 105'),
+        ('CSC304', 'A', 'Sat', '11:30', '14:30', 'Lab 3'),
+        ('MSC203', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 105'),
+        ('HSC110', 'A', 'Tue/Thu', '16:00', '17:30', 'Room 105'),
+        # Semester 6
+        ('CSC301', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 106'),
+        ('CSC302', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 109'),
+        ('CSC302', 'B', 'Tue/Thu', '10:00', '11:30', 'Room 106'),
+        ('CNS302', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 106'),
+        ('CNS302', 'B', 'Tue/Thu', '08:30', '10:00', 'Room 109'),
+        ('CSE204', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 106'),
+        ('DEE101', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 106'),
+        ('DEE101', 'A', 'Fri', '08:30', '11:30', 'Lab 3'),
+        ('DEE101', 'B', 'Mon/Wed', '16:00', '17:30', 'Room 106'),
+        ('DEE101', 'B', 'Fri', '15:00', '18:00', 'Lab 3'),
+        ('DEE102', 'A', 'Tue/Thu', '16:00', '17:30', 'Room 106'),
+        ('DEE102', 'A', 'Fri', '11:30', '14:30', 'Lab 3'),
+        # Semester 7
+        ('CSC303', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 107'),
+        ('MSC301', 'A', 'Tue/Thu', '10:00', '11:30', 'Room 107'),
+        ('DEE103', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 107'),
+        ('DEE103', 'A', 'Sat', '08:30', '11:30', 'Lab 4'),
+        ('DEE104', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 107'),
+        ('DEE104', 'A', 'Sat', '11:30', '14:30', 'Lab 4'),
+        ('ESE101', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 107'),
+        # Semester 8
+        ('CSC496', 'A', 'Mon/Wed', '08:30', '10:00', 'Room 108'),
+        ('CSC496', 'A', 'Sat', '08:30', '11:30', 'Lab 5'),
+        ('HSC311', 'A', 'Tue/Thu', '10:00', '11:30', 'Room 108'),
+        ('DEE105', 'A', 'Mon/Wed', '11:30', '13:00', 'Room 108'),
+        ('DEE106', 'A', 'Tue/Thu', '13:00', '14:30', 'Room 108'),
+        ('DEE107', 'A', 'Wed/Fri', '14:30', '16:00', 'Room 108'),
+        ('CSC497', 'A', 'Tue/Thu', '16:00', '17:30', 'Room 108'),
+        ('CSC497', 'A', 'Sat', '11:30', '14:30', 'Lab 5'),
+    ]
+    TIMETABLE = build_timetable(timetable_raw)
+    for sem_courses in COURSES.values():
+        for course in sem_courses:
+            schedule = TIMETABLE.schedule_of(course["code"])
+            if schedule:
+                course["schedule"] = schedule
+
     FAQ_RESPONSES = {
         "campus timings": "Campus timings: 8:00 AM – 5:00 PM, Monday to Friday.",
         "library": "Library timings: 9:00 AM – 6:00 PM, Monday to Saturday.",
@@ -746,76 +1053,634 @@ def load_data():
         "COURSE_TO_FACULTY": COURSE_TO_FACULTY,
         "FACULTY_TO_COURSES": FACULTY_TO_COURSES,
         "PREREQUISITES": PREREQUISITES,
-        "ACADEMIC_CALENDAR": ACADEMIC_CALENDAR
+        "ACADEMIC_CALENDAR": ACADEMIC_CALENDAR,
+        "TIMETABLE": TIMETABLE
     }
 
-DATA = load_data()
+# Frozen so request threads can share it without locks; replace it with
+# reload_catalogue() instead of editing it in place
+DATA = freeze(load_data())
+
+def protected_names(data):
+    """Names that contain a clause separator ("Civics and Community Engagement")."""
+    return tuple(sorted({
+        name.lower()
+        for name in [c['name'] for sem in data["COURSES"].values() for c in sem]
+        + [e['name'] for e in data["EVENTS"]]
+        + [e['name'] for events in data["ACADEMIC_CALENDAR"].values() for e in events]
+        if CLAUSE_SPLIT.search(name.lower())
+    }))
+
+PROTECTED_NAMES = protected_names(DATA)
+
+# Typeahead over course codes/names, faculty, events and calendar entries
+AUTOCOMPLETE = freeze(build_index(DATA))
+
+# BM25 index over the whole catalogue; reload_catalogue() re-indexes
+# only what changed. The one shared index that is not frozen: sync()
+# publishes a new version and searches read the current one unlocked
+SEARCH = build_search_index(DATA)
 
 # -------------------
-# Flask Routes
+# Static Answer Bundle
 # -------------------
-@app.route("/")
-def home():
-    session.clear()
-    return render_template("index.html")
+def render_static_answers():
+    """Every reply that depends only on DATA, keyed like bundle.PATTERNS."""
+    answers = {f"courses:{semester}": format_courses(semester) for semester in DATA["COURSES"]}
+    answers["faculty"] = format_faculty()
+    answers["events"] = format_events()
+    answers["calendar"] = format_academic_calendar()
+    answers["gpa"] = format_gpa_info()
+    for key, response in DATA["FAQ"].items():
+        answers[f"faq:{key}"] = response
+    return answers
+
+def build_static_bundle():
+    """(digest, body, encoded variants) of the answer bundle for the current DATA."""
+    digest, body = make_bundle(render_static_answers(), PATTERNS + faq_patterns(DATA["FAQ"]))
+    return digest, body, compress_variants(body)
+
+BUNDLE_DIGEST, BUNDLE_BODY, BUNDLE_VARIANTS = build_static_bundle()
 
-@app.route("/chat", methods=["POST"])
-def chat():
-    user_input = request.json.get("message", "").strip()
-    if not user_input:
-        return jsonify({"reply": "Please enter a message."}), 400
+# -------------------
+# Static Assets
+# -------------------
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+ASSETS = load_assets(app.static_folder)
+ASSET_FILES = {asset.filename: asset for asset in ASSETS.values()}
+def asset_version(bundle_digest):
+    """Changes whenever anything the index page links to changes."""
+    return hashlib.sha256(
+        "".join([bundle_digest] + [asset.digest for asset in ASSETS.values()]).encode()
+    ).hexdigest()[:16]
+
+ASSET_VERSION = asset_version(BUNDLE_DIGEST)
+INDEX_PAGES = {}   # (asset version, websocket) -> (page digest, encoded variants of the page)
+
+@app.template_global()
+def asset_url(name):
+    return url_for("asset", filename=ASSETS[name].filename)
+
+def send_variants(variants, mimetype, etag, cache_control):
+    """Respond with the best encoding the client accepts, 304 when unchanged."""
+    encoding, body = negotiate(variants, request.accept_encodings)
+    response = app.response_class(body, mimetype=mimetype)
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = cache_control
+    response.set_etag(f"{etag}-{encoding}")
+    return response.make_conditional(request)
 
-    # Check if user is saying goodbye FIRST
-    user_lower = user_input.lower()
-    goodbye_keywords = ['bye', 'goodbye', 'see you', 'exit', 'quit', 'later']
-    if any(keyword in user_lower for keyword in goodbye_keywords):
-        reply = generate_goodbye()
-        session.clear()
-        return jsonify({"reply": reply})
+# -------------------
+# Event Reminders
+# -------------------
+REMINDER_LEAD = 24 * 3600   # Seconds before an event its reminder goes out
+REMINDER_TERMS = {"fall": "FALL", "spring": "SPRING"}
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+CODE_TTL = 600              # Seconds an email verification code stays valid
+CODE_ATTEMPTS = 5           # Wrong codes before the check is abandoned
+
+def event_start(date, time_text=None):
+    """Epoch seconds of an event; 9:00 AM when the time is missing or 'All Day'."""
+    start = datetime.strptime(date, '%Y-%m-%d').replace(hour=9)
+    try:
+        parsed = datetime.strptime(time_text or "", '%I:%M %p')
+        start = start.replace(hour=parsed.hour, minute=parsed.minute)
+    except ValueError:
+        pass
+    return start.timestamp()
+
+def build_reminder_events():
+    """Every event and calendar entry a student can subscribe to, by key."""
+    events = {}
+    for event in DATA["EVENTS"]:
+        events[f"event:{event['id']}"] = {
+            "title": event['name'],
+            "date": event['date'],
+            "time": event['time'],
+            "notes": event['description'],
+            "start": event_start(event['date'], event['time']),
+        }
+    for category, entries in DATA["ACADEMIC_CALENDAR"].items():
+        for i, entry in enumerate(entries):
+            events[f"calendar:{category}:{i}"] = {
+                "title": entry['name'],
+                "date": entry['date'],
+                "time": "",
+                "notes": entry.get('notes', ''),
+                "start": event_start(entry['date']),
+            }
+    return freeze(events)
+
+REMINDER_EVENTS = build_reminder_events()
+REMINDERS = make_scheduler(os.path.join(app.instance_path, "reminders.db"))
+
+def is_reminder_request(text):
+    return re.search(r"\b(remind|reminders?|notify|subscribe|unsubscribe)\b", text, re.IGNORECASE) is not None
+
+def match_reminder_events(text):
+    """
+    Keys of the events a reminder request asks for: named events, or a
+    group such as "Fall 2026 deadlines" or "holidays". None if neither.
+    """
+    text_lower = text.lower()
+    term = next((code for word, code in REMINDER_TERMS.items() if word in text_lower), None)
+
+    def in_term(key):
+        return term in key or term.lower() in REMINDER_EVENTS[key]['title'].lower()
+
+    titles = {key: event['title'].lower() for key, event in REMINDER_EVENTS.items()}
+    named = [key for key, title in titles.items() if title in text_lower]
+    # "Midterm Exams Week" also contains the event "Midterm Exams", keep the longer name
+    named = [key for key in named if not any(
+        titles[key] != titles[other] and titles[key] in titles[other] for other in named
+    )]
+    if named:
+        return [key for key in named if not term or in_term(key)] or named
+
+    keys, grouped = list(REMINDER_EVENTS), False
+    if term:
+        keys, grouped = [key for key in keys if in_term(key)], True
+    if "deadline" in text_lower:
+        keys, grouped = [key for key in keys if "deadline" in titles[key]], True
+    if "holiday" in text_lower:
+        keys, grouped = [key for key in keys if key.startswith("calendar:HOLIDAYS:")], True
+    if re.search(r"\bevents?\b", text_lower):
+        keys, grouped = [key for key in keys if key.startswith("event:")], True
+    return keys if grouped else None
+
+def format_reminders(pending):
+    response = "<strong>🔔 Your reminders:</strong><br><br>"
+    for due, event in pending:
+        response += f"• <strong>{event['title']}</strong> – {event['date']}"
+        response += f" <small style='color:{SUBTEXT_COLOR};'>(reminder {datetime.fromtimestamp(due):%b %d, %I:%M %p})</small><br>"
+    return response
+
+def find_email(text):
+    match = EMAIL.search(text)
+    return match.group(0).lower() if match else None
+
+def code_digest(email, code, expires):
+    # The session cookie is signed, not encrypted: keep only a keyed hash of the code
+    message = f"{email}:{code}:{expires}".encode()
+    return hmac.new(app.secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+def start_email_check(store, pda, email, text):
+    """
+    Email a one-time code to an address before reminders are bound to it,
+    and hold the request until the code is entered. Returns (reply, reply_type).
+    """
+    code = f"{secrets.randbelow(10 ** 6):06d}"
+    try:
+        REMINDERS.send_code(email, code)
+    except Exception:
+        app.logger.exception("Could not send a verification code")
+        return f"I couldn't send a code to {escape(email)} right now. Please try again later.", "reminder"
+    expires = int(time.time()) + CODE_TTL
+    store['email_check'] = [email, expires, code_digest(email, code, expires), 0]
+    store['pending_reminder'] = text[:500]
+    pda.push('NEED_REMINDER_CODE')
+    return (f"I've sent a 6-digit code to {escape(email)}. "
+            "Please enter it to confirm this is your address."), "prompt"
+
+def check_email_code(store, pda, text):
+    """Handle a reply in the NEED_REMINDER_CODE context. Returns (reply, reply_type)."""
+    email, expires, digest, attempts = store.get('email_check') or (None, 0, "", 0)
+    match = re.search(r"\b\d{6}\b", text)
+    if match and time.time() < expires and hmac.compare_digest(
+            code_digest(email, match.group(0), expires), digest):
+        store.pop('email_check', None)
+        store['reminder_email'] = email
+        pda.pop()
+        return answer_reminder(store, pda, store.pop('pending_reminder', "my reminders"))
+    if time.time() >= expires or attempts + 1 >= CODE_ATTEMPTS:
+        store.pop('email_check', None)
+        store.pop('pending_reminder', None)
+        pda.pop()
+        return "That code is no longer valid. Ask about your reminders again for a new one.", "reminder"
+    store['email_check'] = [email, expires, digest, attempts + 1]
+    return f"That code doesn't match. Please enter the 6-digit code sent to {escape(email)}.", "reprompt"
+
+def answer_reminder(store, pda, text):
+    """
+    Subscribe to, list or cancel event reminders. Reminders are keyed to
+    the student's email, which is confirmed with a one-time code before
+    it is kept in the session. Returns (reply, reply_type).
+    """
+    if REMINDERS is None:
+        return "Reminders are not available right now.", "reminder"
+    email = find_email(text)
+    if email and email != store.get('reminder_email'):
+        return start_email_check(store, pda, email, text)
+    recipient = store.get('reminder_email')
+    if not recipient:
+        store['pending_reminder'] = text[:500]
+        pda.push('NEED_REMINDER_EMAIL')
+        return CONTEXT_PROMPTS['NEED_REMINDER_EMAIL'], "prompt"
+    text_lower = text.lower()
+
+    if re.search(r"\b(cancel|stop|unsubscribe|remove)\b", text_lower):
+        keys = match_reminder_events(text)
+        if keys is None:
+            # No event named: "cancel my reminders", "cancel all reminders"
+            count = REMINDERS.unsubscribe(recipient)
+        else:
+            count = sum(REMINDERS.unsubscribe(recipient, key) for key in keys)
+        if not count:
+            what = "for that" if keys is not None else "to cancel"
+            return f"You have no reminders {what}.", "reminder"
+        return f"🔕 Cancelled {count} reminder{'s' if count != 1 else ''}.", "reminder"
+
+    keys = match_reminder_events(text)
+    if keys is None:
+        if re.search(r"\b(my|list|show|what|which)\b", text_lower):
+            pending = REMINDERS.subscriptions_of(recipient)
+            if not pending:
+                return f"You have no reminders yet for {recipient}.", "reminder"
+            return format_reminders(pending), "reminder"
+        return ("Which event should I remind you about? Try <em>remind me before the Add/Drop Deadline</em> "
+                "or <em>notify me of all Fall 2026 deadlines</em>."), "reminder"
+
+    now = time.time()
+    passed = sum(1 for key in keys if REMINDER_EVENTS[key]['start'] <= now)
+    upcoming = sorted((key for key in keys if REMINDER_EVENTS[key]['start'] > now),
+                      key=lambda key: REMINDER_EVENTS[key]['start'])
+    if not any(term in text_lower for term in REMINDER_TERMS) and "all" not in text_lower.split():
+        # "the Add/Drop Deadline" means the next one, not every term's
+        first = {}
+        for key in upcoming:
+            first.setdefault(REMINDER_EVENTS[key]['title'], key)
+        upcoming = list(first.values())
+    if not upcoming:
+        return "That has already passed, so there is nothing to remind you about.", "reminder"
+
+    added, already = [], []
+    for key in upcoming:
+        event = REMINDER_EVENTS[key]
+        due = max(event['start'] - REMINDER_LEAD, now + 60)
+        if REMINDERS.subscribe(key, due, dict(event), recipient, store.get('user_name')):
+            added.append(event)
+        else:
+            already.append(event)
+
+    response = ""
+    if added:
+        response += f"🔔 I'll email {recipient} a day before:<br>"
+        response += "".join(f"• <strong>{event['title']}</strong> – {event['date']}<br>" for event in added)
+    if already:
+        response += "<br>" if added else ""
+        response += "You're already subscribed to: " + ", ".join(event['title'] for event in already) + "."
+    if passed and len({REMINDER_EVENTS[key]['title'] for key in keys}) > 1:
+        response += f"<br><em style='color:{SUBTEXT_COLOR};'>{passed} of these {'have' if passed != 1 else 'has'} already passed.</em>"
+    return response, "reminder"
+
+# -------------------
+# Course Recommendations
+# -------------------
+# Similarity matrix over the catalogue, cached in the instance folder and
+# memory-mapped so workers share one copy; reload_catalogue() rebuilds it
+RECOMMENDER = build_recommender(DATA, app.instance_path)
+RECOMMEND_COUNT = 5
+
+def faculty_emails(data):
+    return freeze({member['name']: member['email'] for member in data["FACULTY"].values()})
+
+FACULTY_EMAILS = faculty_emails(DATA)
+SEMESTER_MENTION = re.compile(r"\bsem(?:ester)?\s*(\d+)|\b(\d+)(?:st|nd|rd|th)?\s*sem")
+
+def is_recommendation_request(text):
+    return re.search(
+        r"\b(recommend\w*|suggest\w*|what (?:courses? )?should i (?:take|study)|next courses?)\b",
+        text, re.IGNORECASE,
+    ) is not None
 
-    fsm = get_fsm_from_session()
-    pda = get_pda_from_session()
+def mentioned_semester(text):
+    match = SEMESTER_MENTION.search(text.lower())
+    semester = match and (match.group(1) or match.group(2))
+    return int(semester) if semester in DATA["COURSES"] else None
+
+def recommendation_semester(pda, text):
+    """
+    Semester to plan for: the one named in the request, else the one
+    after the last semester the student asked about, else None.
+    """
+    semester = mentioned_semester(text)
+    if semester:
+        return semester
+    for entry in reversed(pda.history[:-1]):
+        semester = mentioned_semester(entry['query'])
+        if semester:
+            return min(semester + 1, len(DATA["COURSES"]))
+    return None
+
+def answer_recommendation(store, pda, text):
+    """Suggest next courses and their instructors. Returns (reply, reply_type)."""
+    asked = [code for entry in pda.history for code in extract_course_codes(entry['query'])]
+    semester = recommendation_semester(pda, text)
+    if not asked and semester is None:
+        return ("Tell me where you are and I'll suggest what to take next, e.g. "
+                "<em>recommend courses for semester 4</em>, or ask about a course first."), "recommendation"
+
+    picks = RECOMMENDER.recommend(asked, store.get('user_dept'), semester, k=RECOMMEND_COUNT)
+    if not picks:
+        return "I couldn't find any courses left to suggest for that semester.", "recommendation"
+
+    heading = f"for semester {semester}" if semester else "for you"
+    response = f"<strong style='color:{HEADER_TEXT};'>🎯 Recommended {heading}:</strong><br><br>"
+    instructors = []
+    for code, _, because in picks:
+        i = RECOMMENDER.index[code]
+        faculty = DATA["COURSE_TO_FACULTY"].get(code, "TBA")
+        response += (f"• <strong>{code}</strong> – {RECOMMENDER.names[i]} "
+                     f"<small style='color:{SUBTEXT_COLOR};'>(Semester {RECOMMENDER.semesters[i]}, {faculty})</small>")
+        if because:
+            response += f" <small style='color:{SUBTEXT_COLOR};'>– related to {because}</small>"
+        response += "<br>"
+        if faculty in FACULTY_EMAILS and faculty not in instructors:
+            instructors.append(faculty)
+
+    if instructors:
+        contacts = ", ".join(f"{name} ({FACULTY_EMAILS[name]})" for name in instructors)
+        response += f"<br><strong>👩‍🏫 Faculty to talk to:</strong> {contacts}"
+    return response, "recommendation"
+
+# -------------------
+# Catalogue Reload
+# -------------------
+# Taken while the catalogue globals are swapped, and by readers that need
+# two of them to agree (bundle digest and body, page and bundle version)
+CATALOGUE_LOCK = threading.Lock()
+
+def reload_catalogue(data=None):
+    """
+    Replace DATA (default: load_data() again) and everything derived from
+    it. New values are built first and swapped in together; the search
+    index is synced and re-indexes only changed documents.
+    Returns the SEARCH.sync (added_or_changed, removed) counts.
+    Nothing in the server calls this yet: load_data() is code, and a
+    change to it ships with a restart. It is the hook for code that
+    loads a new catalogue into a running process.
+    """
+    global DATA, PROTECTED_NAMES, AUTOCOMPLETE, BUNDLE_DIGEST, BUNDLE_BODY, BUNDLE_VARIANTS
+    global ASSET_VERSION, REMINDER_EVENTS, RECOMMENDER, FACULTY_EMAILS
+    with CATALOGUE_LOCK:
+        previous = DATA
+        DATA = freeze(data if data is not None else load_data())
+        try:
+            # Builders below read the DATA global
+            names = protected_names(DATA)
+            autocomplete = freeze(build_index(DATA))
+            bundle = build_static_bundle()
+            reminder_events = build_reminder_events()
+            recommender = build_recommender(DATA, app.instance_path)
+        except Exception:
+            DATA = previous
+            raise
+        PROTECTED_NAMES, AUTOCOMPLETE = names, autocomplete
+        BUNDLE_DIGEST, BUNDLE_BODY, BUNDLE_VARIANTS = bundle
+        ASSET_VERSION = asset_version(BUNDLE_DIGEST)
+        REMINDER_EVENTS, RECOMMENDER = reminder_events, recommender
+        FACULTY_EMAILS = faculty_emails(DATA)
+        return SEARCH.sync(build_documents(DATA))
+
+# -------------------
+# Shadow Evaluation
+# -------------------
+# Candidate routing engines run on sampled live messages next to the
+# production FSM and FAQ matcher; their answers are only recorded.
+SHADOW_RULES = tuple((state, re.compile(pattern)) for state, pattern in [
+    ("GREETING", r"\b(?:hello|hi|hey|hii|helo)\b"),
+    ("FACULTY_QUERY", r"\b(?:faculty|professors?|teachers?|teach(?:es|ing)?|instructors?)\b"),
+    ("COURSE_QUERY", r"\b(?:courses?|semesters?|class(?:es)?|subjects?|units?)\b"),
+    ("EVENT_QUERY", r"\b(?:events?|happening|upcoming|activit(?:y|ies))\b"),
+    ("GPA_QUERY", r"\bgpa\b"),
+    ("GOODBYE", r"\b(?:bye|goodbye|see you)\b"),
+])
+FAQ_MIN_SCORE = 1.5   # BM25 score a FAQ hit needs to count as a match
+
+def classify_word_boundary(text):
+    """FSM.classify with whole-word keywords ("unit" no longer matches "community")."""
+    text = text.lower()
+    for state, pattern in SHADOW_RULES:
+        if pattern.search(text):
+            return state
+    return "GENERAL_QUERY"
+
+def faq_by_search(text):
+    """
+    Best FAQ answer by BM25 instead of substring variants, or None.
+    The hit must share a word with the FAQ topic, so answer text alone
+    ("9:00 AM", "semester") doesn't match.
+    """
+    results = SEARCH.search(text, {"type": "faq"}, limit=1)
+    if results and results[0][0] >= FAQ_MIN_SCORE:
+        key = results[0][1]["title"]
+        if set(tokenize(text)) & set(tokenize(key)):
+            return DATA["FAQ"][key]
+    return None
+
+SHADOW_CANDIDATES = {"fsm": {"word_boundary": classify_word_boundary}, "faq": {"bm25": faq_by_search}}
+SHADOW_PRODUCTION = {"fsm": FSM.classify, "faq": check_faq}
+SHADOW = make_evaluator(SHADOW_CANDIDATES, SHADOW_PRODUCTION)
+
+# -------------------
+# Conversation Logic
+# -------------------
+CONTEXT_PROMPTS = {
+    'NEED_SEMESTER_NUMBER': "Which semester's courses do you want? (1–8)",
+    'NEED_COURSE_CODE': "Which course do you want prerequisites for?",
+    'NEED_FACULTY_NAME': "Which faculty member do you want to know about?",
+    'NEED_REMINDER_EMAIL': "Which email address should I send your reminders to?",
+    'NEED_REMINDER_CODE': "Please enter the 6-digit code I emailed you.",
+}
+
+def answer_query(text, state, pda, store):
+    """
+    Answer one question with no pending PDA context.
+    May push a NEED_* context when a detail is missing. Returns (reply, reply_type).
+    """
+    # Reminders and recommendations read the session (email, department)
+    if is_reminder_request(text):
+        return answer_reminder(store, pda, text)
+    if is_recommendation_request(text):
+        return answer_recommendation(store, pda, text)
+
+    text_lower = text.lower()
+    reply = "I'm here to help! Ask me about courses, faculty, events, or more."
+    reply_type = "fallback"
+
+    search_query = extract_search_query(text)
+    faq_response = check_faq(text)
+    if SHADOW is not None:
+        SHADOW.observe("faq", text, faq_response)
+    specific_event_match = extract_event_name(text)
+    timetable_reply = answer_timetable(text)
+
+    # "find free rooms tuesday 2-4pm" is a timetable question, not a search
+    if timetable_reply:
+        reply = timetable_reply
+        reply_type = "timetable"
+
+    elif search_query:
+        reply = format_search_results(search_query)
+        reply_type = "search"
+
+    elif "prerequisite" in text_lower or "prereq" in text_lower:
+        course_code = extract_course_code(text)
+        if course_code:
+            reply = get_course_prerequisites(course_code)
+            reply_type = "prerequisites"
+        else:
+            pda.push('NEED_COURSE_CODE')
+            reply = CONTEXT_PROMPTS['NEED_COURSE_CODE']
+            reply_type = "prompt"
+
+    elif "calendar" in text_lower or "schedule" in text_lower:
+        reply = format_academic_calendar()
+        reply_type = "calendar"
+
+    elif faq_response:
+        reply = faq_response
+        reply_type = "faq"
+
+    elif "internship" in text_lower:
+        reply = format_internships()
+        reply_type = "internships"
+
+    elif specific_event_match:
+        reply = format_single_event(specific_event_match)
+        reply_type = "event"
+
+    elif state == "COURSE_QUERY":
+        semester = extract_semester_number(text)
+        if semester and semester in DATA["COURSES"]:
+            reply = format_courses(semester)
+            reply_type = "courses"
+        else:
+            pda.push('NEED_SEMESTER_NUMBER')
+            reply = CONTEXT_PROMPTS['NEED_SEMESTER_NUMBER']
+            reply_type = "prompt"
+
+    elif state == "FACULTY_QUERY":
+        semester = extract_semester_number(text)
+        faculty_key = extract_faculty_name(text)
+
+        if semester and semester in DATA["COURSES"]:
+            reply = get_semester_faculty(semester)
+        elif faculty_key:
+            reply = format_faculty(faculty_key)
+        else:
+            reply = format_faculty()
+        reply_type = "faculty"
+
+    elif state == "EVENT_QUERY":
+        reply = format_events()
+        reply_type = "events"
+
+    elif state == "GPA_QUERY":
+        reply = format_gpa_info()
+        reply_type = "gpa"
+
+    return reply, reply_type
+
+def clause_has_intent(clause, state):
+    """Whether a clause of a compound message asks something on its own."""
+    clause_lower = clause.lower()
+    return (
+        state != "GENERAL_QUERY"
+        or "prereq" in clause_lower
+        or "calendar" in clause_lower
+        or "schedule" in clause_lower
+        or "internship" in clause_lower
+        or is_reminder_request(clause)
+        or is_recommendation_request(clause)
+        or answer_timetable(clause) is not None
+        or check_faq(clause) is not None
+        or extract_event_name(clause) is not None
+    )
+
+def split_message(fsm, text):
+    """Find every intent in a message, without splitting inside known names."""
+    if extract_search_query(text):
+        return [(text, "GENERAL_QUERY")]  # The whole message is the search query
+    text_lower = text.lower()
+    protected = []
+    for name in PROTECTED_NAMES:
+        start = text_lower.find(name)
+        while start != -1:
+            protected.append((start, start + len(name)))
+            start = text_lower.find(name, start + 1)
+    return fsm.split_intents(text, clause_has_intent, protected)
+
+def answer_compound(intents, pda, store):
+    """
+    Answer each sub-question of a compound message in one reply.
+    Sub-questions missing a detail push their own NEED_* context, so the
+    PDA keeps asking for them on the following turns.
+    """
+    parts = []
+    seen = set()
+    base = len(pda.stack)
+    for clause, state in intents:
+        depth = len(pda.stack)
+        reply, reply_type = answer_query(clause, state, pda, store)
+        if reply in seen:
+            del pda.stack[depth:]  # Same question twice, don't ask twice
+            continue
+        seen.add(reply)
+        parts.append(f"<em style='color:{SUBTEXT_COLOR};'>“{escape(clause)}”</em><br>{reply}")
+    # Prompts read top to bottom, so the first clause's context goes on top
+    pda.stack[base:] = pda.stack[base:][::-1]
+    divider = f"<hr style='border:none; border-top:1px solid {BORDER_COLOR}; margin:14px 0;'>"
+    return divider.join(parts), "composite"
+
+# "later" alone is a goodbye, "remind me later about tech fest" is not
+GOODBYE_PATTERN = re.compile(
+    r"\b(?:good)?bye\b|\bsee you\b|\bexit\b|\bquit\b|^\W*(?:(?:see you|talk|catch you) )?later\W*$",
+    re.IGNORECASE,
+)
+
+def handle_message(store, fsm, pda, user_input):
+    """
+    Run one chat turn, independent of transport.
+    store is the session or any dict holding the same keys; fsm and pda
+    are updated in place. Returns (reply, reply_type).
+    """
+    # Check if user is saying goodbye FIRST
+    if GOODBYE_PATTERN.search(user_input):
+        store.clear()
+        fsm.reset()
+        pda.clear()
+        return generate_goodbye(), "goodbye"
 
     # ---------------------------
     # USER IDENTIFICATION FLOW
     # ---------------------------
-    if 'user_name' not in session:
-        if 'awaiting_name' not in session:
-            session['awaiting_name'] = True
+    if 'user_name' not in store:
+        if 'awaiting_name' not in store:
+            store['awaiting_name'] = True
             pda.push("ASK_NAME")
-            save_fsm_to_session(fsm)
-            save_pda_to_session(pda)
-            return jsonify({"reply": f"{generate_greeting()}<br><br>What is your name?"})
+            return f"{generate_greeting()}<br><br>What is your name?", "ask_name"
         else:
-            session['user_name'] = user_input.strip()
-            session.pop('awaiting_name', None)
-            session['awaiting_dept'] = True
+            store['user_name'] = user_input.strip()
+            store.pop('awaiting_name', None)
+            store['awaiting_dept'] = True
             pda.pop()
             pda.push("ASK_DEPT")
-            save_fsm_to_session(fsm)
-            save_pda_to_session(pda)
-            return jsonify({
-                "reply": f"Nice to meet you, {session['user_name']}! Which department are you in?"
-            })
+            return f"Nice to meet you, {store['user_name']}! Which department are you in?", "ask_dept"
 
-    elif 'user_dept' not in session:
-        if 'awaiting_dept' not in session:
-            session['awaiting_dept'] = True
+    elif 'user_dept' not in store:
+        if 'awaiting_dept' not in store:
+            store['awaiting_dept'] = True
             pda.push("ASK_DEPT")
-            save_fsm_to_session(fsm)
-            save_pda_to_session(pda)
-            return jsonify({
-                "reply": f"{session['user_name']}, which department are you in?"
-            })
+            return f"{store['user_name']}, which department are you in?", "ask_dept"
         else:
-            session['user_dept'] = user_input.strip()
-            session.pop('awaiting_dept', None)
+            store['user_dept'] = user_input.strip()
+            store.pop('awaiting_dept', None)
             pda.pop()
-            save_fsm_to_session(fsm)
-            save_pda_to_session(pda)
-            return jsonify({
-                "reply": f"Hey {session['user_name']} from {session['user_dept']}! How can I help you today?"
-            })
+            return f"Hey {store['user_name']} from {store['user_dept']}! How can I help you today?", "welcome"
 
     # ---------------------------
     # MAIN CHAT LOGIC (FSM + PDA)
@@ -823,17 +1688,13 @@ def chat():
     pda.add_history(user_input, getattr(fsm, 'state', 'GENERAL_QUERY'))
     context = pda.top()
 
-    # FSM transition
+    # FSM transition (also tracks FSM history)
     state = fsm.transition(user_input)
-
-    # Track FSM history
-    fsm_history = session.get('fsm_history', ['START'])
-    fsm_history.append(state)
-    if len(fsm_history) > 10:
-        fsm_history.pop(0)
-    session['fsm_history'] = fsm_history
+    if SHADOW is not None:
+        SHADOW.observe("fsm", user_input, state)
 
     reply = "I'm here to help! Ask me about courses, faculty, events, or more."
+    reply_type = "fallback"
 
     try:
         if context and context not in ['ASK_NAME', 'ASK_DEPT']:
@@ -842,111 +1703,351 @@ def chat():
                 semester = extract_semester_number(user_input)
                 if semester and semester in DATA["COURSES"]:
                     reply = format_courses(semester)
+                    reply_type = "courses"
                     pda.pop()
                 else:
                     reply = "Please enter a valid semester number (1–8)."
+                    reply_type = "reprompt"
 
             elif context == 'NEED_FACULTY_NAME':
                 faculty_key = extract_faculty_name(user_input)
                 reply = format_faculty(faculty_key)
+                reply_type = "faculty"
                 pda.pop()
 
+            elif context == 'NEED_REMINDER_EMAIL':
+                email = find_email(user_input)
+                if email:
+                    pda.pop()
+                    reply, reply_type = start_email_check(
+                        store, pda, email, store.pop('pending_reminder', "my reminders"))
+                else:
+                    reply = "Please enter a valid email address (e.g., ali@uni.edu)."
+                    reply_type = "reprompt"
+
+            elif context == 'NEED_REMINDER_CODE':
+                reply, reply_type = check_email_code(store, pda, user_input)
+
             elif context == 'NEED_COURSE_CODE':
                 course_code = extract_course_code(user_input)
                 if course_code:
                     reply = get_course_prerequisites(course_code)
+                    reply_type = "prerequisites"
                     pda.pop()
                 else:
                     reply = "Please provide a valid course code (e.g., CSC201)."
+                    reply_type = "reprompt"
+
+            # A compound message may have left more sub-questions open
+            if reply_type not in ("reprompt", "prompt") and pda.top() in CONTEXT_PROMPTS:
+                reply += f"<br><br>{CONTEXT_PROMPTS[pda.top()]}"
 
         else:
-            faq_response = check_faq(user_input)
-            specific_event_match = extract_event_name(user_input)
+            intents = split_message(fsm, user_input)
+            if len(intents) > 1:
+                reply, reply_type = answer_compound(intents, pda, store)
+            else:
+                reply, reply_type = answer_query(user_input, state, pda, store)
 
-            if "prerequisite" in user_lower or "prereq" in user_lower:
-                course_code = extract_course_code(user_input)
-                if course_code:
-                    reply = get_course_prerequisites(course_code)
-                else:
-                    pda.push('NEED_COURSE_CODE')
-                    reply = "Which course do you want prerequisites for?"
+    except Exception as e:
+        app.logger.exception("Chat error: %s", e)
+        reply = "Sorry, something went wrong. Please try again."
+        reply_type = "error"
 
-            elif "calendar" in user_lower or "schedule" in user_lower:
-                reply = format_academic_calendar()
+    return reply, reply_type
 
-            elif faq_response:
-                reply = faq_response
+MAX_LOCAL_MESSAGE = 500
 
-            elif "internship" in user_lower:
-                reply = format_internships()
+def record_local_answer(fsm, pda, user_input):
+    """
+    A message the page answered from the static bundle. It is kept in
+    the history and FSM like a served turn, so later context (e.g.
+    course recommendations) sees it.
+    """
+    pda.add_history(user_input, getattr(fsm, 'state', 'GENERAL_QUERY'))
+    fsm.transition(user_input)
 
-            elif specific_event_match:
-                reply = format_single_event(specific_event_match)
+# -------------------
+# Admission Control
+# -------------------
+RATE_LIMITER = RateLimiter(make_store())
+ADMISSION = AdmissionController()
 
-            elif state == "COURSE_QUERY":
-                pda.push('NEED_SEMESTER_NUMBER')
-                reply = "Which semester's courses do you want? (1–8)"
+@app.before_request
+def admit_chat_request():
+    """Rate limit /chat per session and IP, shed load when saturated."""
+    if request.endpoint not in ("chat", "record_history"):
+        return None
 
-            elif state == "FACULTY_QUERY":
-                semester = extract_semester_number(user_input)
-                faculty_key = extract_faculty_name(user_input)
+    sid = session.setdefault('sid', uuid.uuid4().hex)
+    allowed, retry_after = RATE_LIMITER.check(sid, request.remote_addr)
+    if not allowed:
+        response = jsonify({"reply": "You're sending messages too quickly. Please wait a moment."})
+        response.headers["Retry-After"] = retry_after_header(retry_after)
+        return response, 429
+
+    admitted, retry_after = ADMISSION.try_acquire()
+    if not admitted:
+        response = jsonify({"reply": "The server is busy right now. Please try again shortly."})
+        response.headers["Retry-After"] = retry_after_header(retry_after)
+        return response, 503
+
+    g.sid = sid
+    g.chat_started = time.perf_counter()
+    return None
 
-                if semester:
-                    reply = get_semester_faculty(semester)
-                elif faculty_key:
-                    reply = format_faculty(faculty_key)
-                else:
-                    reply = format_faculty()
+# -------------------
+# Transcript Logging
+# -------------------
+TRANSCRIPT = make_logger(os.path.join(app.instance_path, "transcripts.db"))
+ANALYTICS = make_analytics(TRANSCRIPT)
+
+def log_turn(sid, message, fsm, pda, reply_type, started, status=200):
+    """Queue one transcript record, never blocks."""
+    if TRANSCRIPT is None:
+        return
+    TRANSCRIPT.log({
+        "ts": time.time(),
+        "session_id": sid,
+        "message": message,
+        "fsm_state": fsm.state,
+        "pda_stack": list(pda.stack),
+        "reply_type": reply_type,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "status": status,
+    })
 
-            elif state == "EVENT_QUERY":
-                reply = format_events()
+@app.after_request
+def log_chat_turn(response):
+    """Queue one transcript record per /chat turn, off the request path."""
+    reply_type = g.get('reply_type')
+    if reply_type is not None:
+        log_turn(g.get('sid'), g.get('message'), g.fsm, g.pda, reply_type, g.chat_started, response.status_code)
+    return response
 
-            elif state == "GPA_QUERY":
-                reply = format_gpa_info()
+@app.teardown_request
+def release_chat_slot(exc):
+    """Free the admission slot taken in admit_chat_request."""
+    started = g.pop('chat_started', None)
+    if started is not None:
+        ADMISSION.release(time.perf_counter() - started)
 
-    except Exception as e:
-        print("Chat route error:", e)
-        reply = "Sorry, something went wrong. Please try again."
+# -------------------
+# WebSocket Transport
+# -------------------
+CHECKPOINT_EVERY = 20       # Turns between checkpoints on a live socket
+# An open socket holds a gthread worker thread for its whole life; past
+# this many per process new sockets are refused and the page falls back
+# to HTTP, so some threads always stay free for requests. 0: no limit
+MAX_SOCKETS = int(os.environ.get("CHATBOT_MAX_SOCKETS", 0))
+SOCKET_SLOTS = threading.BoundedSemaphore(MAX_SOCKETS) if MAX_SOCKETS else None
+# Shared by the worker processes: the next HTTP request may reach any of them
+CHECKPOINTS = make_checkpoints(
+    os.path.join(app.instance_path, "checkpoints.db"), app.session_interface.serializer
+)
+
+def save_checkpoint(sid, store):
+    """Keep a socket's conversation until the next HTTP request picks it up."""
+    CHECKPOINTS.save(sid, store)
+
+def restore_checkpoint():
+    """Merge a pending socket checkpoint into the cookie session."""
+    sid = session.get('sid')
+    if not sid:
+        return
+    snapshot = CHECKPOINTS.take(sid)
+    if snapshot is not None:
+        session.clear()
+        session.update(snapshot)
+
+def conversation_state(fsm, pda, previous_stack):
+    """State pushed to the client after every socket message."""
+    return {
+        "current_state": fsm.state,
+        "history": fsm.history.copy(),
+        "stack": pda.stack.copy(),
+        "operation": stack_operation(previous_stack, pda.stack),
+    }
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route("/ws")
+    def chat_socket(ws):
+        """
+        Persistent chat channel.
+        FSM and PDA live in memory for the connection and are written to
+        the checkpoint store every CHECKPOINT_EVERY turns and on disconnect.
+        """
+        if SOCKET_SLOTS is not None and not SOCKET_SLOTS.acquire(blocking=False):
+            ws.close(reason=1013, message="Too many open chats, use HTTP")   # 1013: try again later
+            return
+        try:
+            serve_socket(ws)
+        finally:
+            if SOCKET_SLOTS is not None:
+                SOCKET_SLOTS.release()
+
+    def serve_socket(ws):
+        restore_checkpoint()
+        sid = session.get('sid') or uuid.uuid4().hex
+        store = dict(session)
+        store['sid'] = sid
+        fsm, pda, monitor_stack = load_conversation(store)
+        ip = request.remote_addr
+        turns = 0
+
+        try:
+            while True:
+                try:
+                    data = json.loads(ws.receive())
+                except ValueError:
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                if data.get("type") == "checkpoint":
+                    save_conversation(fsm, pda, monitor_stack, store)
+                    save_checkpoint(sid, store)
+                    ws.send(json.dumps({"type": "checkpoint", "status": "ok"}))
+                    continue
+                if data.get("type") == "history":
+                    # Answered in the page; recorded without a reply
+                    message = str(data.get("message", "")).strip()[:MAX_LOCAL_MESSAGE]
+                    if message:
+                        record_local_answer(fsm, pda, message)
+                        monitor_stack = pda.stack.copy()
+                        save_conversation(fsm, pda, monitor_stack, store)
+                    continue
+
+                started = time.perf_counter()
+                user_input = str(data.get("message", "")).strip()
+                if not user_input:
+                    ws.send(json.dumps({"type": "reply", "reply": "Please enter a message."}))
+                    continue
+
+                allowed, retry_after = RATE_LIMITER.check(sid, ip)
+                if not allowed:
+                    ws.send(json.dumps({
+                        "type": "reply",
+                        "reply": "You're sending messages too quickly. Please wait a moment.",
+                        "retry_after": retry_after,
+                    }))
+                    continue
+
+                admitted, retry_after = ADMISSION.try_acquire()
+                if not admitted:
+                    ws.send(json.dumps({
+                        "type": "reply",
+                        "reply": "The server is busy right now. Please try again shortly.",
+                        "retry_after": retry_after,
+                    }))
+                    continue
+
+                try:
+                    previous_stack = pda.stack.copy()
+                    reply, reply_type = handle_message(store, fsm, pda, user_input)
+                    store['sid'] = sid
+                    monitor_stack = pda.stack.copy()
+                    save_conversation(fsm, pda, monitor_stack, store)
+                    ws.send(json.dumps({
+                        "type": "reply",
+                        "reply": reply,
+                        "reply_type": reply_type,
+                        "state": conversation_state(fsm, pda, previous_stack),
+                    }))
+                finally:
+                    ADMISSION.release(time.perf_counter() - started)
+                log_turn(sid, user_input, fsm, pda, reply_type, started)
+
+                turns += 1
+                if turns % CHECKPOINT_EVERY == 0:
+                    save_checkpoint(sid, store)
+        except ConnectionClosed:
+            pass
+        finally:
+            save_conversation(fsm, pda, pda.stack, store)
+            save_checkpoint(sid, store)
+
+# -------------------
+# Flask Routes
+# -------------------
+@app.route("/")
+def home():
+    """
+    The page has no per-user content, so it is rendered once per asset
+    version and revalidated with its ETag, a hash of the rendered HTML
+    so a template change alone also changes it. The page script starts
+    the conversation with POST /reset.
+    """
+    with CATALOGUE_LOCK:
+        version, bundle_digest = ASSET_VERSION, BUNDLE_DIGEST
+    key = (version, Sock is not None)
+    page = INDEX_PAGES.get(key)
+    if page is None:
+        html = render_template(
+            "index.html",
+            websocket=Sock is not None,
+            bundle_url=url_for("answer_bundle", digest=bundle_digest),
+        ).encode("utf-8")
+        page = INDEX_PAGES[key] = (hashlib.sha256(html).hexdigest()[:16], compress_variants(html))
+    digest, variants = page
+    return send_variants(variants, "text/html", digest, "no-cache")
+
+@app.route("/chat", methods=["POST"])
+def chat():
+    user_input = request.json.get("message", "").strip()
+    g.message = user_input
+    restore_checkpoint()
+    fsm, pda, previous_stack = load_conversation()
+    g.fsm, g.pda = fsm, pda
+    if not user_input:
+        g.reply_type = "empty"
+        return jsonify({"reply": "Please enter a message."}), 400
+
+    reply, g.reply_type = handle_message(session, fsm, pda, user_input)
 
     # Save states
-    save_fsm_to_session(fsm)
-    save_pda_to_session(pda)
+    save_conversation(fsm, pda, previous_stack)
 
-    return jsonify({"reply": reply})
+    return jsonify({"reply": reply, "reply_type": g.reply_type})
 
 @app.route("/reset", methods=["POST"])
 def reset():
+    # The verified reminder email identifies the student, not the conversation
+    reminder_email = session.get('reminder_email')
     session.clear()
+    session['sid'] = uuid.uuid4().hex
+    if reminder_email:
+        session['reminder_email'] = reminder_email
     return jsonify({"status": "Conversation reset successfully!"})
 
 @app.route("/history", methods=["GET"])
 def get_history():
-    pda = get_pda_from_session()
+    restore_checkpoint()
+    fsm, pda, previous_stack = load_conversation()
     return jsonify({"history": pda.get_history(limit=10)})
 
+@app.route("/history", methods=["POST"])
+def record_history():
+    """The page reports a message it answered from the static bundle."""
+    message = str((request.get_json(silent=True) or {}).get("message", "")).strip()[:MAX_LOCAL_MESSAGE]
+    if not message:
+        return jsonify({"status": "Please enter a message."}), 400
+    restore_checkpoint()
+    fsm, pda, previous_stack = load_conversation()
+    record_local_answer(fsm, pda, message)
+    save_conversation(fsm, pda, previous_stack)
+    return "", 204
+
 @app.route("/get_pda_state", methods=["GET"])
 def get_pda_state():
-    pda = get_pda_from_session()
-    fsm = get_fsm_from_session()
-
-    previous_stack = session.get('previous_pda_stack', []).copy()
+    restore_checkpoint()
+    fsm, pda, previous_stack = load_conversation()
     current_stack = pda.stack.copy()
-    operation = None
-
-    if len(current_stack) > len(previous_stack):
-        pushed_item = current_stack[-1] if current_stack else None
-        if pushed_item:
-            operation = {'type': 'push', 'text': f'PUSH: {pushed_item}'}
-    elif len(current_stack) < len(previous_stack):
-        popped_item = None
-        for i in range(len(previous_stack)-1, -1, -1):
-            if i >= len(current_stack) or previous_stack[i] != current_stack[i]:
-                popped_item = previous_stack[i]
-                break
-        if popped_item:
-            operation = {'type': 'pop', 'text': f'POP: {popped_item}'}
+    operation = stack_operation(previous_stack, current_stack)
 
-    session['previous_pda_stack'] = current_stack.copy()
+    if previous_stack != current_stack:
+        save_conversation(fsm, pda, current_stack)
     return jsonify({
         "stack": current_stack,
         "current_state": fsm.state,
@@ -956,11 +2057,85 @@ def get_pda_state():
 
 @app.route("/get_fsm_history", methods=["GET"])
 def get_fsm_history():
-    fsm_history = session.get('fsm_history', ['START'])
+    restore_checkpoint()
+    fsm, pda, previous_stack = load_conversation()
     return jsonify({
-        "history": fsm_history,
-        "current_state": session.get('fsm_state', 'START')
+        "history": fsm.history,
+        "current_state": fsm.state
     })
 
+@app.route("/bundle/answers.<digest>.json")
+def answer_bundle(digest):
+    """Pre-rendered answers; the name changes with the content, so cache forever."""
+    with CATALOGUE_LOCK:
+        current, variants = BUNDLE_DIGEST, BUNDLE_VARIANTS
+    if digest != current:
+        return jsonify({"error": "Unknown bundle version."}), 404
+    return send_variants(variants, "application/json", digest, IMMUTABLE)
+
+@app.route("/assets/<filename>")
+def asset(filename):
+    """Fingerprinted style.css / app.js; the name changes with the content, so cache forever."""
+    asset = ASSET_FILES.get(filename)
+    if asset is None:
+        return jsonify({"error": "Unknown asset version."}), 404
+    return send_variants(asset.variants, asset.mimetype, asset.digest, IMMUTABLE)
+
+@app.route("/autocomplete", methods=["GET"])
+def autocomplete():
+    """
+    Suggestions for what the user is typing.
+    Tries up to the last four words, then fewer, so
+    "prerequisites for CSC2" still completes "CSC2".
+    """
+    words = request.args.get("q", "").split()
+    for i in range(max(0, len(words) - 4), len(words)):
+        query = " ".join(words[i:])
+        suggestions = AUTOCOMPLETE.suggest(query)
+        if suggestions:
+            return jsonify({"query": query, "suggestions": suggestions})
+    return jsonify({"query": "", "suggestions": []})
+
+@app.route("/search", methods=["GET"])
+def search():
+    """
+    Catalogue search. q accepts field filters such as type:event or
+    semester:3 next to the search words.
+    """
+    query = request.args.get("q", "")
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    text, filters = parse_query(query)
+    results = SEARCH.search(text, filters, limit=limit)
+    return jsonify({
+        "query": text,
+        "filters": filters,
+        "results": [dict(doc, score=round(score, 4)) for score, doc in results],
+    })
+
+@app.route("/reminders", methods=["GET"])
+def reminders():
+    """Pending reminders of the email verified in this session."""
+    if REMINDERS is None:
+        return jsonify({"error": "Reminders are disabled."}), 404
+    recipient = session.get('reminder_email')
+    pending = REMINDERS.subscriptions_of(recipient) if recipient else []
+    return jsonify({"reminders": [dict(event, due=due) for due, event in pending]})
+
+@app.route("/shadow", methods=["GET"])
+def shadow():
+    """Agreement and latency of the shadow candidates against production."""
+    if SHADOW is None:
+        return jsonify({"error": "Shadow evaluation is disabled."}), 404
+    return jsonify(SHADOW.stats())
+
+@app.route("/analytics", methods=["GET"])
+def analytics():
+    if ANALYTICS is None:
+        return jsonify({"error": "Transcript logging is disabled."}), 404
+    hours = request.args.get("hours", 24, type=int)
+    if hours < 1:
+        return jsonify({"error": "hours must be at least 1."}), 400
+    return jsonify(ANALYTICS.summary(hours))
+
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Fingerprinted, precompressed static assets.
+
+style.css and app.js are served as name.<hash>.ext so they can be
+cached forever. gzip variants, and br variants when the brotli package
+is installed, are compressed once at startup and picked per request
+from Accept-Encoding.
+
+    python assets.py              # write static/dist/ for a CDN or nginx gzip_static
+    python assets.py --benchmark  # first and repeat page load
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # br variants are optional, gzip is always built
+    brotli = None
+
+ASSETS = ("style.css", "app.js")
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def compress_variants(body):
+    """{encoding: bytes} with identity plus every compressed form that is smaller."""
+    variants = {"identity": body}
+    compressed = {"gzip": gzip.compress(body, 9, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(body, quality=11)
+    for encoding, data in compressed.items():
+        if len(data) < len(body):
+            variants[encoding] = data
+    return variants
+
+
+def negotiate(variants, accept_encodings):
+    """Best (encoding, body) for a werkzeug Accept-Encoding header."""
+    for encoding in ("br", "gzip"):
+        if encoding in variants and accept_encodings[encoding]:
+            return encoding, variants[encoding]
+    return "identity", variants["identity"]
+
+
+class Asset:
+    """One static file with its content hash and encoded variants."""
+
+    def __init__(self, name, body):
+        self.name = name
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        root, ext = os.path.splitext(name)
+        self.filename = f"{root}.{self.digest}{ext}"
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.variants = compress_variants(body)
+
+
+def load_assets(static_dir, names=ASSETS):
+    """{logical name: Asset} for the files in static_dir."""
+    assets = {}
+    for name in names:
+        with open(os.path.join(static_dir, name), "rb") as f:
+            assets[name] = Asset(name, f.read())
+    return assets
+
+
+def write_assets(static_dir, out_dir):
+    """Write every variant plus manifest.json (logical name -> fingerprinted name)."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for name, asset in load_assets(static_dir).items():
+        for encoding, data in asset.variants.items():
+            with open(os.path.join(out_dir, asset.filename + SUFFIXES.get(encoding, "")), "wb") as f:
+                f.write(data)
+        manifest[name] = asset.filename
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def benchmark(rounds=200):
+    """
+    In-process page loads through the test client. A first load fetches
+    the page and every asset; a repeat load only revalidates the page,
+    since fingerprinted assets stay in the browser cache.
+    """
+    import re
+    import time
+    os.environ.setdefault("CHATBOT_TRANSCRIPT", "off")
+    os.environ.setdefault("CHATBOT_REMINDERS", "off")
+    from app import app
+
+    client = app.test_client()
+
+    def first_load(encoding):
+        headers = {"Accept-Encoding": encoding}
+        res = client.get("/", headers=headers)
+        html = gzip.decompress(res.data) if res.headers.get("Content-Encoding") == "gzip" else res.data
+        urls = re.findall(r'(?:href|src|data-bundle-url)="(/[^"]+)"', html.decode("utf-8"))
+        total = len(res.data) + sum(len(client.get(url, headers=headers).data) for url in urls)
+        return res.headers["ETag"], total, 1 + len(urls)
+
+    def repeat_load(etag):
+        res = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert res.status_code == 304
+        return len(res.data)
+
+    def timed(run):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            run()
+        return (time.perf_counter() - started) / rounds * 1000
+
+    for encoding in ("identity", "gzip"):
+        etag, size, requests = first_load(encoding)
+        ms = timed(lambda: first_load(encoding))
+        print(f"first load ({encoding:<8})  {ms:6.2f} ms  {size:>7,} bytes  {requests} requests")
+    ms = timed(lambda: repeat_load(etag))
+    print(f"repeat load (304)      {ms:6.2f} ms  {repeat_load(etag):>7,} bytes  1 request")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or benchmark the static assets.")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+    here = os.path.dirname(os.path.abspath(__file__))
+    if args.benchmark:
+        benchmark()
+    else:
+        print(json.dumps(write_assets(os.path.join(here, "static"), os.path.join(here, "static", "dist")), indent=2))
@@ -0,0 +1,70 @@
+from bisect import bisect_left
+
+# Lower sorts first in suggestions
+KIND_RANK = {"course": 0, "faculty": 1, "event": 2, "calendar": 3}
+
+
+class PrefixIndex:
+    """
+    Typeahead over a sorted array of lowercase keys.
+    Every entry is indexed under its full text and under each later word,
+    so "dat" finds "Data Structures" and "alg" finds it too. A lookup is
+    one bisect plus a scan over the matching run.
+    """
+
+    def __init__(self, entries, max_scan=200):
+        # entries: (text, kind, label, value); text is what gets matched,
+        # label is shown and value is what the input is filled with
+        keys = []
+        for text, kind, label, value in entries:
+            words = text.lower().split()
+            for i in range(len(words)):
+                # i == 0 is a whole-string match, ranked above word matches
+                keys.append((" ".join(words[i:]), i > 0, KIND_RANK.get(kind, 9), label, kind, value))
+        keys.sort()
+        self.keys = [key[0] for key in keys]
+        self.entries = [key[1:] for key in keys]
+        self.max_scan = max_scan
+
+    def suggest(self, query, limit=8):
+        """Ranked suggestions for a prefix, as dicts."""
+        query = " ".join(query.lower().split())
+        if not query:
+            return []
+        start = bisect_left(self.keys, query)
+        candidates = []
+        for i in range(start, min(start + self.max_scan, len(self.keys))):
+            if not self.keys[i].startswith(query):
+                break
+            is_word, kind_rank, label, kind, value = self.entries[i]
+            candidates.append((is_word, kind_rank, self.keys[i], label, kind, value))
+        candidates.sort()
+
+        results, seen = [], set()
+        for _, _, _, label, kind, value in candidates:
+            if (kind, label) in seen:
+                continue
+            seen.add((kind, label))
+            results.append({"label": label, "type": kind, "value": value})
+            if len(results) == limit:
+                break
+        return results
+
+
+def build_index(data):
+    """Index course codes and names, faculty, events and calendar entries."""
+    entries = []
+    for courses in data["COURSES"].values():
+        for course in courses:
+            label = f"{course['code']} – {course['name']}"
+            entries.append((course['code'], "course", label, course['code']))
+            entries.append((course['name'], "course", label, course['code']))
+    for key, faculty in data["FACULTY"].items():
+        entries.append((faculty['name'], "faculty", faculty['name'], faculty['name']))
+        entries.append((key, "faculty", faculty['name'], faculty['name']))
+    for event in data["EVENTS"]:
+        entries.append((event['name'], "event", event['name'], event['name']))
+    for events in data["ACADEMIC_CALENDAR"].values():
+        for event in events:
+            entries.append((event['name'], "calendar", f"{event['name']} ({event['date']})", event['name']))
+    return PrefixIndex(entries)
@@ -0,0 +1,58 @@
+"""
+Pre-rendered answer bundle for context-free queries.
+
+Replies that depend only on DATA (course tables, faculty, events,
+calendar, GPA guide, FAQ) are rendered once into a JSON bundle named
+by its content hash, so it can be cached forever. The page loads it and
+answers exact matches locally instead of calling /chat.
+
+    python bundle.py            # writes static/bundle/answers.<hash>.json
+"""
+import hashlib
+import json
+import os
+
+BUNDLE_VERSION = 1
+
+# (JS-compatible regex, answer key). "{1}" in the key is replaced by the
+# first capture group. Patterns are anchored and matched case-insensitively
+# on the trimmed message, so only unambiguous messages are answered locally.
+PATTERNS = [
+    (r"^(?:show |list )?(?:me )?(?:the )?(?:semester|sem) ?([1-8]) (?:courses|subjects)$", "courses:{1}"),
+    (r"^(?:show |list )?(?:me )?(?:the )?(?:courses|subjects) (?:for|of|in) (?:semester|sem) ?([1-8])$", "courses:{1}"),
+    (r"^(?:show |list )?(?:me )?(?:all )?(?:the )?(?:faculty|faculty members|professors|teachers)$", "faculty"),
+    (r"^(?:show |list )?(?:me )?(?:all )?(?:the )?(?:upcoming )?events$", "events"),
+    (r"^(?:show )?(?:me )?(?:the )?(?:academic )?calendar$", "calendar"),
+    (r"^(?:gpa|gpa calculator|calculate gpa|how to calculate gpa)$", "gpa"),
+]
+
+
+def faq_patterns(faq_keys):
+    """One exact-match pattern per FAQ key ("library", "campus timings", ...)."""
+    return [(f"^{key}$", f"faq:{key}") for key in faq_keys]
+
+
+def make_bundle(answers, patterns):
+    """Serialize the bundle. Returns (digest, body bytes)."""
+    payload = {"version": BUNDLE_VERSION, "patterns": patterns, "answers": answers}
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    return digest, body
+
+
+def write_bundle(directory):
+    """Write answers.<hash>.json for serving from a CDN or plain static host."""
+    os.environ.setdefault("CHATBOT_TRANSCRIPT", "off")
+    os.environ.setdefault("CHATBOT_REMINDERS", "off")
+    from app import BUNDLE_DIGEST, BUNDLE_BODY
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"answers.{BUNDLE_DIGEST}.json")
+    with open(path, "wb") as f:
+        f.write(BUNDLE_BODY)
+    return path
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(write_bundle(os.path.join(here, "static", "bundle")))
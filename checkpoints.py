@@ -0,0 +1,94 @@
+"""
+Checkpoints of WebSocket conversations.
+
+A socket keeps its conversation in memory and cannot set the session
+cookie, so it saves a snapshot of the session under its sid. The next
+HTTP request of that browser takes the snapshot and merges it into the
+cookie. The request can land on any worker, so the default store is a
+SQLite file every worker process shares.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCheckpointStore:
+    """In-process store, only for a single worker process."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # sid -> session snapshot
+        self.lock = threading.Lock()
+
+    def save(self, sid, snapshot):
+        with self.lock:
+            self.entries[sid] = dict(snapshot)
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def take(self, sid):
+        """Remove and return the snapshot for sid, or None."""
+        with self.lock:
+            return self.entries.pop(sid, None)
+
+
+class SQLiteCheckpointStore:
+    """
+    Snapshots in a SQLite table, shared by all worker processes.
+    take() deletes and returns the row in one statement, so a snapshot
+    is merged by exactly one request. Snapshots nobody picked up are
+    dropped after ttl seconds.
+    """
+
+    def __init__(self, path, serializer, ttl=86400, prune_interval=60.0):
+        self.path = path
+        self.serializer = serializer   # dumps/loads, e.g. the session serializer
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.next_prune = 0.0
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints (sid TEXT PRIMARY KEY, saved REAL, snapshot TEXT)"
+        )
+
+    def _conn(self):
+        """One connection per thread, SQLite connections are not shareable."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def save(self, sid, snapshot):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (sid, saved, snapshot) VALUES (?, ?, ?)",
+            (sid, now, self.serializer.dumps(dict(snapshot))),
+        )
+        if now >= self.next_prune:
+            self.next_prune = now + self.prune_interval
+            conn.execute("DELETE FROM checkpoints WHERE saved < ?", (now - self.ttl,))
+
+    def take(self, sid):
+        """Remove and return the snapshot for sid, or None."""
+        row = self._conn().execute(
+            "DELETE FROM checkpoints WHERE sid = ? RETURNING snapshot", (sid,)
+        ).fetchone()
+        return self.serializer.loads(row[0]) if row else None
+
+
+def make_checkpoints(default_path, serializer):
+    """
+    Build the store from CHATBOT_CHECKPOINTS: a SQLite path, or "memory"
+    for a single-process server.
+    """
+    path = os.environ.get("CHATBOT_CHECKPOINTS", default_path)
+    if path == "memory":
+        return MemoryCheckpointStore()
+    return SQLiteCheckpointStore(path, serializer)
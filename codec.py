@@ -0,0 +1,201 @@
+"""
+Compact binary encoding of the conversation state kept in the session.
+
+FSM states and PDA symbols are written as their enum codes, lists as a
+varint count followed by their items. One blob replaces the string keys
+fsm_state, fsm_history, pda_stack, pda_history and previous_pda_stack.
+
+    byte     version
+    varint   fsm state
+    varint   n, n x state                fsm history
+    varint   n, n x symbol               pda stack
+    varint   n, n x symbol               stack last shown by the monitor
+    varint   n, n x (str, state)         pda history (query, intent)
+
+A str is a varint byte length and UTF-8 bytes. Code 0 is an escape for a
+name without an enum code, followed by the name as a str, so a new state
+or symbol never breaks older blobs. Run this file for a size and timing
+comparison against the JSON session keys:
+
+    python codec.py
+"""
+from fsm import FSM, State
+from pda import PDA, Symbol
+
+VERSION = 1
+HISTORY_LIMIT = 10   # PDA history entries kept; /history shows at most 10
+
+# Plain dict lookups; Enum attribute access is several times slower
+CODES = {State: {s.name: s.value for s in State}, Symbol: {s.name: s.value for s in Symbol}}
+NAMES = {State: {s.value: s.name for s in State}, Symbol: {s.value: s.name for s in Symbol}}
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1   # Every code and count in practice
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _write_str(out, text):
+    raw = text.encode("utf-8")
+    _write_varint(out, len(raw))
+    out += raw
+
+
+def _read_str(data, pos):
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    if end > len(data):
+        raise IndexError("truncated string")
+    return data[pos:end].decode("utf-8"), end
+
+
+def _write_name(out, enum, name):
+    code = CODES[enum].get(name)
+    if code is not None:
+        _write_varint(out, code)
+    else:
+        out.append(0)
+        _write_str(out, name)
+
+
+def _read_name(data, pos, enum):
+    code, pos = _read_varint(data, pos)
+    if code == 0:
+        return _read_str(data, pos)
+    try:
+        return NAMES[enum][code], pos
+    except KeyError:
+        raise ValueError(f"unknown {enum.__name__} code {code}") from None
+
+
+def _write_names(out, enum, names):
+    _write_varint(out, len(names))
+    for name in names:
+        _write_name(out, enum, name)
+
+
+def _read_names(data, pos, enum):
+    count, pos = _read_varint(data, pos)
+    names = []
+    for _ in range(count):
+        name, pos = _read_name(data, pos, enum)
+        names.append(name)
+    return names, pos
+
+
+def encode(fsm, pda, previous_stack=()):
+    """Pack FSM, PDA and the monitor's last-seen stack into bytes."""
+    out = bytearray([VERSION])
+    _write_name(out, State, fsm.state)
+    _write_names(out, State, fsm.history)
+    _write_names(out, Symbol, pda.stack)
+    _write_names(out, Symbol, previous_stack)
+    history = pda.history[-HISTORY_LIMIT:]
+    _write_varint(out, len(history))
+    for entry in history:
+        _write_str(out, entry["query"])
+        _write_name(out, State, entry["intent"])
+    return bytes(out)
+
+
+def decode(data):
+    """
+    Unpack a blob from encode() into (fsm, pda, previous_stack).
+    Empty data gives a fresh conversation; ValueError if the blob is
+    malformed or from an unknown version.
+    """
+    fsm, pda = FSM(), PDA()
+    if not data:
+        return fsm, pda, []
+    if data[0] != VERSION:
+        raise ValueError(f"unknown state version {data[0]}")
+    try:
+        fsm.state, pos = _read_name(data, 1, State)
+        fsm.history, pos = _read_names(data, pos, State)
+        pda.stack, pos = _read_names(data, pos, Symbol)
+        previous_stack, pos = _read_names(data, pos, Symbol)
+        count, pos = _read_varint(data, pos)
+        for _ in range(count):
+            query, pos = _read_str(data, pos)
+            intent, pos = _read_name(data, pos, State)
+            pda.add_history(query, intent)
+    except (IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"malformed state: {e}") from None
+    if pos != len(data):
+        raise ValueError("trailing bytes after state")
+    return fsm, pda, previous_stack
+
+
+def benchmark(rounds=20000):
+    """Compare encoded size and time against the JSON session keys."""
+    import json
+    import os
+    import time
+    os.environ.setdefault("CHATBOT_TRANSCRIPT", "off")
+    os.environ.setdefault("CHATBOT_REMINDERS", "off")
+    from app import app
+
+    fsm, pda = FSM(), PDA()
+    for query in ["hi", "Ali", "Computer Science", "show semester 3 courses", "prerequisites",
+                  "CSC201", "who teaches semester 4", "upcoming events", "gpa", "library timings",
+                  "academic calendar", "courses"]:
+        pda.add_history(query, fsm.state)
+        fsm.transition(query)
+    pda.history = pda.history[-HISTORY_LIMIT:]
+    pda.stack = ["NEED_SEMESTER_NUMBER"]
+    previous = ["NEED_COURSE_CODE"]
+    base = {"sid": "0" * 32, "user_name": "Ali", "user_dept": "Computer Science"}
+
+    as_json = dict(base, fsm_state=fsm.state, fsm_history=fsm.history, pda_stack=pda.stack,
+                   pda_history=pda.history, previous_pda_stack=previous)
+    as_binary = dict(base, state=encode(fsm, pda, previous))
+
+    def json_round_trip():
+        data = json.loads(json.dumps({k: as_json[k] for k in as_json if k not in base}))
+        f, p = FSM(), PDA()
+        f.state, f.history = data["fsm_state"], data["fsm_history"]
+        p.stack, p.history = data["pda_stack"], data["pda_history"]
+        return f, p, data["previous_pda_stack"]
+
+    def binary_round_trip():
+        return decode(encode(fsm, pda, previous))
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    print(f"{'':24}{'json':>10}{'binary':>10}")
+    state_json = len(json.dumps({k: as_json[k] for k in as_json if k not in base}, separators=(",", ":")))
+    print(f"{'state bytes':24}{state_json:>10}{len(as_binary['state']):>10}")
+    print(f"{'signed cookie bytes':24}{len(serializer.dumps(as_json)):>10}{len(serializer.dumps(as_binary)):>10}")
+    timings = []
+    for round_trip in (json_round_trip, binary_round_trip):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            round_trip()
+        timings.append((time.perf_counter() - started) / rounds * 1e6)
+    print(f"{'state round trip us':24}{timings[0]:>10.1f}{timings[1]:>10.1f}")
+    timings = []
+    for session_data in (as_json, as_binary):
+        started = time.perf_counter()
+        for _ in range(rounds // 4):
+            serializer.loads(serializer.dumps(session_data))
+        timings.append((time.perf_counter() - started) / (rounds // 4) * 1e6)
+    print(f"{'cookie round trip us':24}{timings[0]:>10.1f}{timings[1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,33 +1,103 @@
+import re
+from enum import IntEnum
+
+# Connectives that separate independent questions in one message
+CLAUSE_SPLIT = re.compile(r"\s*(?:[,;?]|\band\b|\balso\b|\bthen\b|\bplus\b)\s*")
+
+
+class State(IntEnum):
+    """FSM states; the values are the wire codes used by codec.py, never reuse one."""
+    START = 1
+    GREETING = 2
+    COURSE_QUERY = 3
+    EVENT_QUERY = 4
+    FACULTY_QUERY = 5
+    GPA_QUERY = 6
+    GOODBYE = 7
+    GENERAL_QUERY = 8
+
+
 class FSM:
     """
     Finite State Machine (FSM) for chatbot.
     Tracks current conversation state and adapts based on user input.
     """
 
+    STATES = tuple(state.name for state in State)
+    HISTORY_LIMIT = 10   # States kept in history
+
     def __init__(self):
         self.state = "START"
+        self.history = ["START"]   # Recent states, oldest first
 
-    def transition(self, text):
+    def reset(self):
+        """Back to START with a fresh history."""
+        self.state = "START"
+        self.history = ["START"]
+
+    @staticmethod
+    def classify(text):
         """
-        Decide next state based on user input.
+        Classify user input without changing the current state.
         """
         text = text.lower()
         words = text.split()  # Split into words for exact matching
 
         # Check for greeting with word boundaries
         if any(word in words for word in ["hello", "hi", "hey", "hii", "helo"]):
-            self.state = "GREETING"
+            return "GREETING"
+        # Faculty before course so "who teaches semester 4" asks about faculty
+        elif "faculty" in text or "professor" in text or "teacher" in text or "teach" in text or "instructor" in text:
+            return "FACULTY_QUERY"
         elif "course" in text or "semester" in text or "class" in text or "subject" in text or "unit" in text:
-            self.state = "COURSE_QUERY"
+            return "COURSE_QUERY"
         elif "events" in text or "happening" in text or "upcoming" in text or "event" in text or "activities" in text or "activity" in text:
-            self.state = "EVENT_QUERY"
-        elif "faculty" in text or "professor" in text or "teacher" in text:
-            self.state = "FACULTY_QUERY"
+            return "EVENT_QUERY"
         elif "gpa" in text or "calculate gpa" in text:
-            self.state = "GPA_QUERY"
+            return "GPA_QUERY"
         elif any(word in words for word in ["bye", "goodbye"]) or "see you" in text:
-            self.state = "GOODBYE"
+            return "GOODBYE"
         else:
-            self.state = "GENERAL_QUERY"  # fallback
+            return "GENERAL_QUERY"  # fallback
+
+    def transition(self, text):
+        """
+        Decide next state based on user input.
+        """
+        self.state = self.classify(text)
+        self.history.append(self.state)
+        del self.history[:-self.HISTORY_LIMIT]
+        return self.state
+
+    def split_intents(self, text, has_intent=None, protected=()):
+        """
+        Split a compound message into (clause, state) pairs, one per intent.
+        has_intent(clause, state) decides whether a clause asks something on
+        its own; by default any state but GENERAL_QUERY does. Clauses that
+        don't are joined back onto the clause before them, using the
+        original text so names like "Civics and Community Engagement"
+        survive. Separators inside a protected (start, end) span, such as a
+        known course name, are not split on. Greetings are dropped.
+        """
+        if has_intent is None:
+            has_intent = lambda clause, state: state != "GENERAL_QUERY"
 
-        return self.state
\ No newline at end of file
+        spans = []  # [start, end, state]
+        pos = 0
+        seps = [
+            sep for sep in CLAUSE_SPLIT.finditer(text)
+            if not any(start <= sep.start() < end for start, end in protected)
+        ]
+        for sep in seps + [None]:
+            end = sep.start() if sep else len(text)
+            clause = text[pos:end].strip()
+            if clause:
+                state = self.classify(clause)
+                if state == "GREETING":
+                    pass
+                elif spans and not has_intent(clause, state):
+                    spans[-1][1] = end
+                else:
+                    spans.append([pos, end, state])
+            pos = sep.end() if sep else pos
+        return [(text[start:end].strip(), state) for start, end, state in spans]
@@ -0,0 +1,26 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# Threaded workers: each process serves many slow clients from a pool of
+# threads sharing the frozen DATA and indexes. Per-request state lives
+# only in the session, flask.g and locals.
+# On a free-threaded build (python3.13t, PYTHON_GIL=0) the threads also
+# run turns in parallel; check with `python stress.py` first.
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+# gthread gives every open /ws connection a thread for its whole life.
+# Half of each worker's threads may hold sockets (workers * threads / 2
+# open chats in total); further sockets are refused and those pages use
+# HTTP, so the other half always serves requests. Raise GUNICORN_THREADS
+# for more concurrent socket chats.
+os.environ.setdefault("CHATBOT_MAX_SOCKETS", str(max(1, threads // 2)))
+
+# No preload: the transcript writer and reminder threads must start inside
+# each worker, threads do not survive the fork. Every worker runs a reminder
+# thread on the shared reminders.db; due events are claimed in SQLite, so
+# each is delivered by one worker
+preload_app = False
@@ -0,0 +1,84 @@
+"""
+Load test for /chat admission control.
+
+Runs one abusive client that sends as fast as it can next to several
+well-behaved clients, all in-process through the Flask test client, and
+reports status counts and latency percentiles for each group.
+
+    python loadtest.py --seconds 10 --users 8
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from app import app, ADMISSION
+
+MESSAGES = ["hello", "Ali", "Computer Science", "show faculty", "courses", "3", "events", "gpa"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_client(ip, delay, deadline, latencies, statuses):
+    client = app.test_client()
+    i = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        res = client.post(
+            "/chat",
+            json={"message": MESSAGES[i % len(MESSAGES)]},
+            environ_base={"REMOTE_ADDR": ip},
+        )
+        latencies.append(time.perf_counter() - started)
+        statuses[res.status_code] += 1
+        i += 1
+        if delay:
+            time.sleep(delay)
+
+
+def report(label, latencies, statuses):
+    print(
+        f"{label:<10} requests={len(latencies):<7} statuses={dict(statuses)} "
+        f"p50={percentile(latencies, 50) * 1000:.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.2f}ms "
+        f"max={max(latencies, default=0) * 1000:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=8, help="well-behaved clients")
+    parser.add_argument("--abusers", type=int, default=4, help="threads hammering from one IP")
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds between user messages")
+    args = parser.parse_args()
+
+    deadline = time.perf_counter() + args.seconds
+    good_lat, good_status = [], Counter()
+    bad_lat, bad_status = [], Counter()
+
+    threads = [
+        threading.Thread(target=run_client, args=(f"10.0.0.{n + 1}", args.delay, deadline, good_lat, good_status))
+        for n in range(args.users)
+    ]
+    threads += [
+        threading.Thread(target=run_client, args=("10.0.9.9", 0, deadline, bad_lat, bad_status))
+        for _ in range(args.abusers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report("users", good_lat, good_status)
+    report("abuser", bad_lat, bad_status)
+    print("admission:", ADMISSION.stats())
+
+
+if __name__ == "__main__":
+    main()
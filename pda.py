@@ -1,3 +1,17 @@
+from enum import IntEnum
+
+
+class Symbol(IntEnum):
+    """Stack symbols; the values are the wire codes used by codec.py, never reuse one."""
+    ASK_NAME = 1
+    ASK_DEPT = 2
+    NEED_SEMESTER_NUMBER = 3
+    NEED_COURSE_CODE = 4
+    NEED_FACULTY_NAME = 5
+    NEED_REMINDER_EMAIL = 6
+    NEED_REMINDER_CODE = 7
+
+
 class PDA:
     """
     Pushdown Automaton (PDA) for chatbot conversation memory.
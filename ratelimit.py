@@ -0,0 +1,180 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+
+class MemoryBucketStore:
+    """
+    In-process token bucket store.
+    Buckets live in a dict guarded by a lock, idle buckets are pruned.
+    """
+
+    def __init__(self, max_keys=50000):
+        self.buckets = {}        # key -> (tokens, last_refill)
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, capacity, now=None):
+        """Take one token from the bucket. Returns (allowed, retry_after)."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, last = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0
+            else:
+                self.buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / rate
+            if len(self.buckets) > self.max_keys:
+                self._prune(now, capacity / rate)
+        return allowed, retry_after
+
+    def _prune(self, now, idle_after):
+        """Drop buckets that have been idle long enough to be full again."""
+        for key in [k for k, (_, last) in self.buckets.items() if now - last > idle_after]:
+            del self.buckets[key]
+
+
+class SQLiteBucketStore:
+    """
+    Token bucket store shared by every worker process on one host.
+    Uses a local SQLite file; each take() is one short write transaction.
+    Each row records when its bucket is full again; rows past that are
+    deleted every prune_interval seconds, a missing row being a full bucket.
+    """
+
+    def __init__(self, path, prune_interval=60.0):
+        self.path = path
+        self.prune_interval = prune_interval
+        self.next_prune = 0.0
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, last REAL NOT NULL, full_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(buckets)")]
+        if "full_at" not in columns:  # Table from before pruning
+            conn.execute("ALTER TABLE buckets ADD COLUMN full_at REAL NOT NULL DEFAULT 0")
+
+    def _conn(self):
+        """One connection per thread, SQLite connections are not shareable."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self.local.conn = conn
+        return conn
+
+    def take(self, key, rate, capacity, now=None):
+        """Take one token from the bucket. Returns (allowed, retry_after)."""
+        # Wall clock, monotonic time is not comparable across processes
+        now = time.time() if now is None else now
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, last FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, last = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+            if tokens >= 1:
+                allowed, retry_after = True, 0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, last, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / rate),
+            )
+            if now >= self.next_prune:
+                self.next_prune = now + self.prune_interval
+                conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # Store is locked or unavailable: fail open rather than block the request
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return True, 0
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter keyed by session and by client IP.
+    The IP bucket is larger so several sessions behind one NAT still fit.
+    """
+
+    def __init__(self, store=None, session_rate=2.0, session_burst=10, ip_rate=10.0, ip_burst=40):
+        self.store = store or MemoryBucketStore()
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+
+    def check(self, session_id, ip):
+        """Returns (allowed, retry_after_seconds)."""
+        allowed, retry_after = self.store.take(f"ip:{ip}", self.ip_rate, self.ip_burst)
+        if not allowed:
+            return False, retry_after
+        if session_id:
+            return self.store.take(f"sid:{session_id}", self.session_rate, self.session_burst)
+        return True, 0
+
+
+class AdmissionController:
+    """
+    Global concurrency cap with latency based load shedding.
+    Rejects fast when too many requests are in flight or when the
+    smoothed latency of recent requests crosses the threshold.
+    """
+
+    def __init__(self, max_inflight=32, latency_threshold=0.5, alpha=0.2, retry_after=1):
+        self.max_inflight = max_inflight
+        self.latency_threshold = latency_threshold
+        self.alpha = alpha
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.latency_ewma = 0.0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """Returns (admitted, retry_after_seconds)."""
+        with self.lock:
+            if self.inflight >= self.max_inflight:
+                self.rejected += 1
+                return False, self.retry_after
+            # Under latency pressure keep only half the slots so the queue drains
+            if self.latency_ewma > self.latency_threshold and self.inflight >= self.max_inflight // 2:
+                self.rejected += 1
+                return False, self.retry_after
+            self.inflight += 1
+            return True, 0
+
+    def release(self, elapsed):
+        """Mark a request finished and fold its latency into the average."""
+        with self.lock:
+            self.inflight = max(0, self.inflight - 1)
+            self.latency_ewma += self.alpha * (elapsed - self.latency_ewma)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "inflight": self.inflight,
+                "latency_ewma_ms": round(self.latency_ewma * 1000, 3),
+                "rejected": self.rejected,
+            }
+
+
+def make_store():
+    """Shared SQLite store when CHATBOT_RATELIMIT_DB is set, in-process otherwise."""
+    path = os.environ.get("CHATBOT_RATELIMIT_DB")
+    return SQLiteBucketStore(path) if path else MemoryBucketStore()
+
+
+def retry_after_header(seconds):
+    """Retry-After takes whole seconds."""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,319 @@
+"""
+Next-course recommendations.
+
+A course-to-course similarity matrix is built once with NumPy from the
+prerequisite graph (direct and two-step links, both directions), the
+semester layout, shared instructors and shared words in course names.
+A recommendation weights the rows of the courses a student asked about
+(recent ones more), adds a department and target-semester prior, masks
+courses already done or still locked behind prerequisites, and takes
+the top k. Nothing per request loops over courses in Python.
+
+With a cache directory the matrix is written once as a .npy file keyed
+by the catalogue and memory-mapped read-only, so worker processes share
+one copy through the page cache instead of each building its own.
+
+    python recommend.py --courses 20000                 # scoring benchmark
+    python recommend.py --courses 20000 --cache /tmp    # plus a second worker's load
+"""
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # No cross-process build lock; workers may build concurrently
+    fcntl = None
+
+from search import tokenize
+
+WEIGHTS = {"prereq": 1.0, "two_step": 0.5, "semester": 0.3, "faculty": 0.3, "words": 0.6}
+RECENCY = 0.7          # Each older query counts this much less
+DEPT_BOOST = 0.4       # Courses of the student's department
+SEMESTER_BOOST = 0.5   # Courses of the target semester, decaying after it
+BLOCK = 2048           # Rows built per step, bounds the temporaries
+
+# Words in a free-text department -> course code prefixes it covers
+DEPT_PREFIXES = {
+    "computer": ("CSC", "CIC", "CNS"),
+    "cs": ("CSC", "CIC", "CNS"),
+    "software": ("CSE", "CSC"),
+    "se": ("CSE", "CSC"),
+    "data": ("CIC", "ASC", "CSC"),
+    "ai": ("CIC",),
+    "artificial": ("CIC",),
+    "security": ("CNS",),
+    "cyber": ("CNS",),
+    "network": ("CNS",),
+    "networks": ("CNS",),
+    "math": ("ASC",),
+    "mathematics": ("ASC",),
+    "management": ("MSC",),
+    "business": ("MSC",),
+}
+
+
+class CourseRecommender:
+    """
+    courses: [(code, name, semester)]; prerequisites: {code: [code, ...]};
+    instructors: {code: name}. Codes outside courses are ignored.
+    cache_dir: where to keep the memory-mapped matrix, or None to build
+    it in memory.
+    """
+
+    def __init__(self, courses, prerequisites, instructors, weights=WEIGHTS, dtype=np.float32, cache_dir=None):
+        self.codes = [code for code, _, _ in courses]
+        self.names = [name for _, name, _ in courses]
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.semesters = np.array([semester for _, _, semester in courses], dtype=np.int16)
+        prefixes = sorted({code[:3] for code in self.codes})
+        self.prefix_ids = {prefix: i for i, prefix in enumerate(prefixes)}
+        self.prefixes = np.array([self.prefix_ids[code[:3]] for code in self.codes], dtype=np.int16)
+        self.weights = weights
+        self.priors = {}   # (department prefix ids, semester) -> prior()
+        self.priors_lock = threading.Lock()
+
+        edges = [
+            (self.index[before], self.index[code])
+            for code, befores in prerequisites.items() if code in self.index
+            for before in befores if before in self.index
+        ]
+        self.prereq_src = np.array([a for a, _ in edges], dtype=np.int32)
+        self.prereq_dst = np.array([b for _, b in edges], dtype=np.int32)
+        if cache_dir is None:
+            self.matrix = self._build(edges, instructors, weights, dtype)
+        else:
+            self.matrix = self._cached(cache_dir, edges, instructors, weights, dtype)
+
+    def _cached(self, cache_dir, edges, instructors, weights, dtype):
+        """Load the matrix for this catalogue from cache_dir, building it under a file lock if missing."""
+        key = hashlib.sha256(repr((
+            self.codes, self.names, self.semesters.tolist(), edges,
+            sorted(instructors.items()), sorted(weights.items()), np.dtype(dtype).str,
+        )).encode()).hexdigest()[:16]
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"course_similarity.{key}.npy")
+        with open(os.path.join(cache_dir, "course_similarity.lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # One worker builds, the others wait and load
+            if not os.path.exists(path):
+                matrix = self._build(edges, instructors, weights, dtype)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, matrix)
+                os.replace(tmp, path)
+                del matrix
+                for old in glob.glob(os.path.join(cache_dir, "course_similarity.*.npy")):
+                    if old != path:
+                        os.remove(old)  # Earlier catalogue; mapped copies stay valid
+        return np.load(path, mmap_mode="r")
+
+    def _build(self, edges, instructors, weights, dtype):
+        n = len(self.codes)
+        matrix = np.empty((n, n), dtype=dtype)
+
+        # Shared name words: cosine of idf-weighted bags of words
+        vocab, rows, cols = {}, [], []
+        for i, name in enumerate(self.names):
+            for word in set(tokenize(name)):
+                rows.append(i)
+                cols.append(vocab.setdefault(word, len(vocab)))
+        words = np.zeros((n, max(len(vocab), 1)), dtype=dtype)
+        words[rows, cols] = 1.0
+        words *= np.log((1 + n) / (1 + words.sum(axis=0))).astype(dtype)
+        norms = np.linalg.norm(words, axis=1, keepdims=True)
+        words /= np.where(norms > 0, norms, 1)
+
+        # Semester closeness through a small lookup table
+        top = int(self.semesters.max(initial=0)) + 1
+        steps = np.abs(np.subtract.outer(np.arange(top), np.arange(top)))
+        closeness = (weights["semester"] * np.exp(-steps)).astype(dtype)
+
+        for start in range(0, n, BLOCK):
+            stop = min(start + BLOCK, n)
+            block = matrix[start:stop]
+            np.matmul(words[start:stop], words.T, out=block)
+            block *= weights["words"]
+            block += closeness[self.semesters[start:stop, None], self.semesters[None, :]]
+
+        if edges:
+            src, dst = self.prereq_src, self.prereq_dst
+            np.add.at(matrix, (src, dst), weights["prereq"])
+            np.add.at(matrix, (dst, src), weights["prereq"])
+            following = {}
+            for a, b in edges:
+                following.setdefault(a, []).append(b)
+            two_step = [(a, c) for a, b in edges for c in following.get(b, ()) if c != a]
+            if two_step:
+                a, c = np.array(two_step, dtype=np.int32).T
+                np.add.at(matrix, (a, c), weights["two_step"])
+                np.add.at(matrix, (c, a), weights["two_step"])
+
+        taught = {}
+        for code, name in instructors.items():
+            if code in self.index:
+                taught.setdefault(name, []).append(self.index[code])
+        for members in taught.values():
+            if len(members) > 1:
+                matrix[np.ix_(members, members)] += weights["faculty"]
+
+        np.fill_diagonal(matrix, 0)
+        return matrix
+
+    def prior(self, dept=None, semester=None):
+        """
+        Per-course starting score for a department and target semester:
+        the department and semester boosts, and -inf for courses already
+        done or still locked behind prerequisites. Cached per combination;
+        the cache is the only state recommend() writes.
+        """
+        prefixes = {p for word in tokenize(dept or "") for p in DEPT_PREFIXES.get(word, ())}
+        ids = frozenset(self.prefix_ids[p] for p in prefixes if p in self.prefix_ids)
+        key = (ids, semester)
+        prior = self.priors.get(key)
+        if prior is not None:
+            return prior
+
+        prior = np.zeros(len(self.codes), dtype=self.matrix.dtype)
+        if ids:
+            prior += DEPT_BOOST * np.isin(self.prefixes, list(ids))
+        if semester is not None:
+            ahead = np.maximum(self.semesters - semester, 0)
+            prior += SEMESTER_BOOST * np.exp(-ahead).astype(prior.dtype)
+            done = self.semesters < semester
+            prior[done] = -np.inf
+            # Locked until every prerequisite is done
+            prior[self.prereq_dst[~done[self.prereq_src]]] = -np.inf
+        prior.flags.writeable = False   # Shared between request threads
+        with self.priors_lock:
+            return self.priors.setdefault(key, prior)
+
+    def recommend(self, history, dept=None, semester=None, k=5):
+        """
+        history: course codes the student asked about, oldest first.
+        semester: the semester to plan for; earlier ones count as done.
+        Returns [(code, score, because)], best first, where because is the
+        asked-about course that contributed most, or None.
+        """
+        asked = [self.index[code] for code in dict.fromkeys(reversed(history)) if code in self.index]
+        scores = self.prior(dept, semester).copy()
+        weights = RECENCY ** np.arange(len(asked))
+        for i, weight in zip(asked, weights):
+            scores += weight * self.matrix[i]
+        scores[asked] = -np.inf
+        top = self.top(scores, k)
+
+        because = [None] * len(top)
+        if asked and top:
+            # Contribution of each asked-about course to each pick
+            parts = self.matrix[np.ix_(asked, [j for j, _ in top])] * weights[:, None]
+            best = parts.argmax(axis=0)
+            because = [
+                self.codes[asked[b]] if parts[b, n] >= self.weights["two_step"] else None
+                for n, b in enumerate(best)
+            ]
+        return [(self.codes[j], score, reason) for (j, score), reason in zip(top, because)]
+
+    @staticmethod
+    def top(scores, k):
+        """
+        [(index, score)] of the k best finite scores, best first; clobbers
+        scores. Scores have few distinct values (shared semester and
+        department terms), where argpartition's introselect degrades, so
+        small k takes k argmax passes instead.
+        """
+        if k > 32:
+            candidates = np.flatnonzero(np.isfinite(scores))
+            order = np.argsort(-scores[candidates], kind="stable")[:k]
+            return [(int(j), float(scores[j])) for j in candidates[order]]
+        picks = []
+        for _ in range(min(k, len(scores))):
+            j = int(scores.argmax())
+            if scores[j] == -np.inf:
+                break
+            picks.append((j, float(scores[j])))
+            scores[j] = -np.inf
+        return picks
+
+
+def build_recommender(data, cache_dir=None):
+    """Recommender over a DATA-shaped catalogue (COURSES, PREREQUISITES, COURSE_TO_FACULTY)."""
+    courses = [
+        (course["code"], course["name"], int(semester))
+        for semester, semester_courses in data["COURSES"].items()
+        for course in semester_courses
+    ]
+    return CourseRecommender(courses, data["PREREQUISITES"], data["COURSE_TO_FACULTY"], cache_dir=cache_dir)
+
+
+def synthetic_catalogue(count, seed=0):
+    """count courses over 8 semesters with up to two earlier prerequisites each."""
+    rng = np.random.default_rng(seed)
+    vocab = [f"topic{i}" for i in range(max(50, count // 20))]
+    semesters = np.sort(rng.integers(1, 9, size=count))
+    courses, prerequisites, instructors = [], {}, {}
+    for i, semester in enumerate(semesters):
+        code = f"C{i:06d}"
+        name = " ".join(rng.choice(vocab, size=3, replace=False))
+        courses.append((code, name, int(semester)))
+        earlier = np.searchsorted(semesters, semester)   # First course of this semester
+        befores = rng.integers(0, earlier, size=rng.integers(0, 3)) if earlier else []
+        prerequisites[code] = [f"C{b:06d}" for b in sorted(set(befores))]
+        instructors[code] = f"faculty{i // 2}"
+    return courses, prerequisites, instructors
+
+
+def benchmark(count, queries=2000, k=5, cache_dir=None):
+    """
+    Build over a synthetic catalogue, then time single recommendations.
+    With cache_dir the matrix goes through the cache, and a second
+    recommender is loaded the way another worker would load it.
+    """
+    import time
+
+    courses, prerequisites, instructors = synthetic_catalogue(count)
+    started = time.perf_counter()
+    recommender = CourseRecommender(courses, prerequisites, instructors, cache_dir=cache_dir)
+    build = time.perf_counter() - started
+    load = None
+    if cache_dir is not None:
+        started = time.perf_counter()
+        recommender = CourseRecommender(courses, prerequisites, instructors, cache_dir=cache_dir)
+        load = time.perf_counter() - started
+
+    rng = np.random.default_rng(1)
+    codes = recommender.codes
+    requests = [
+        ([codes[i] for i in rng.integers(0, count, size=rng.integers(1, 8))],
+         "Computer Science", int(rng.integers(1, 9)))
+        for _ in range(queries)
+    ]
+    for semester in range(1, 9):
+        recommender.prior("Computer Science", semester)   # Warm the per-semester priors
+    timings = []
+    for history, dept, semester in requests:
+        started = time.perf_counter()
+        recommender.recommend(history, dept, semester, k=k)
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1e6
+
+    print(f"courses            {count:,}, matrix {recommender.matrix.nbytes / 2 ** 20:,.0f} MiB "
+          f"({recommender.matrix.dtype})")
+    print(f"build              {build:.2f} s")
+    if load is not None:
+        print(f"cached load        {load * 1000:.0f} ms (memory-mapped, shared)")
+    print(f"recommend (top {k})  p50 {np.percentile(timings, 50):.0f} us  "
+          f"p99 {np.percentile(timings, 99):.0f} us  max {timings.max():.0f} us")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark course recommendations.")
+    parser.add_argument("--courses", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--cache", help="directory for the memory-mapped matrix")
+    args = parser.parse_args()
+    benchmark(args.courses, args.queries, cache_dir=args.cache)
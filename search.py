@@ -0,0 +1,293 @@
+"""
+Full-text search over the university catalogue.
+
+One inverted index with BM25 ranking over courses, faculty, events,
+calendar entries and FAQ answers. Run this file to benchmark it against
+a catalogue 100x the current size:
+
+    python search.py --scale 100
+"""
+import hashlib
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN = re.compile(r"[a-z0-9]+")
+TITLE_WEIGHT = 2    # Title terms count this many times
+STOPWORDS = {
+    "a", "an", "and", "are", "about", "at", "for", "from", "in", "is", "me",
+    "of", "on", "or", "show", "tell", "the", "to", "what", "when", "which", "with",
+}
+
+
+def tokenize(text):
+    return [term for term in TOKEN.findall(text.lower()) if term not in STOPWORDS]
+
+
+class Postings:
+    """One published version of the index; never changed once published."""
+
+    __slots__ = ("postings", "docs", "lengths", "hashes", "total_length")
+
+    def __init__(self, postings=None, docs=None, lengths=None, hashes=None, total_length=0):
+        self.postings = postings if postings is not None else {}   # term -> {doc_id: term frequency}
+        self.docs = docs if docs is not None else {}               # doc_id -> document
+        self.lengths = lengths if lengths is not None else {}      # doc_id -> document length in terms
+        self.hashes = hashes if hashes is not None else {}         # doc_id -> content hash, for sync()
+        self.total_length = total_length
+
+
+class SearchIndex:
+    """
+    Inverted index with BM25 ranking.
+    Documents are dicts with id, type, title, text and optional filter
+    fields (semester, category, ...). add/remove touch only the postings
+    of that document, and sync() re-indexes only documents whose content
+    changed, so the index never has to be rebuilt from scratch.
+    Updates are copy-on-write: they copy the maps they change and publish
+    the new version in one assignment. search() reads whichever version
+    is current without locking; the lock only orders the writers.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.current = Postings()
+        self.lock = threading.Lock()
+
+    @property
+    def postings(self):
+        return self.current.postings
+
+    @property
+    def docs(self):
+        return self.current.docs
+
+    @staticmethod
+    def _terms(doc):
+        terms = Counter(tokenize(doc.get("text", "")))
+        for term in tokenize(doc.get("title", "")):
+            terms[term] += TITLE_WEIGHT
+        return terms
+
+    @staticmethod
+    def _hash(doc):
+        return hashlib.sha1(repr(sorted(doc.items())).encode()).hexdigest()
+
+    def _update(self, edit):
+        """Run edit(draft, term_postings) on a copy of the index and publish it."""
+        with self.lock:
+            old = self.current
+            draft = Postings(dict(old.postings), dict(old.docs), dict(old.lengths),
+                             dict(old.hashes), old.total_length)
+            copied = set()
+
+            def term_postings(term):
+                # Inner maps are copied the first time this update touches them
+                if term not in copied or term not in draft.postings:
+                    copied.add(term)
+                    draft.postings[term] = dict(draft.postings.get(term, ()))
+                return draft.postings[term]
+
+            result = edit(draft, term_postings)
+            self.current = draft
+            return result
+
+    def _add(self, draft, term_postings, doc):
+        if doc["id"] in draft.docs:
+            self._remove(draft, term_postings, doc["id"])
+        terms = self._terms(doc)
+        for term, tf in terms.items():
+            term_postings(term)[doc["id"]] = tf
+        length = sum(terms.values())
+        draft.docs[doc["id"]] = doc
+        draft.lengths[doc["id"]] = length
+        draft.hashes[doc["id"]] = self._hash(doc)
+        draft.total_length += length
+
+    def _remove(self, draft, term_postings, doc_id):
+        doc = draft.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for term in self._terms(doc):
+            if term in draft.postings:
+                postings = term_postings(term)
+                postings.pop(doc_id, None)
+                if not postings:
+                    del draft.postings[term]
+        draft.total_length -= draft.lengths.pop(doc_id)
+        draft.hashes.pop(doc_id, None)
+
+    def add(self, doc):
+        """Index a document, replacing any earlier version with the same id."""
+        self._update(lambda draft, term_postings: self._add(draft, term_postings, doc))
+
+    def remove(self, doc_id):
+        self._update(lambda draft, term_postings: self._remove(draft, term_postings, doc_id))
+
+    def sync(self, docs):
+        """
+        Bring the index in line with a full document list.
+        Only added, changed and removed documents are re-indexed, and
+        the result is published as one new version.
+        Returns (added_or_changed, removed) counts.
+        """
+        def edit(draft, term_postings):
+            seen, changed = set(), 0
+            for doc in docs:
+                seen.add(doc["id"])
+                if draft.hashes.get(doc["id"]) != self._hash(doc):
+                    self._add(draft, term_postings, doc)
+                    changed += 1
+            stale = [doc_id for doc_id in draft.docs if doc_id not in seen]
+            for doc_id in stale:
+                self._remove(draft, term_postings, doc_id)
+            return changed, len(stale)
+
+        return self._update(edit)
+
+    def search(self, query, filters=None, limit=10):
+        """
+        BM25 top-k for the query terms.
+        filters maps a document field to the value it must equal
+        (case-insensitive), e.g. {"type": "event", "semester": "3"}.
+        Returns [(score, doc), ...] best first.
+        """
+        index = self.current   # One consistent version for the whole query
+        terms = tokenize(query)
+        filters = {key: str(value).lower() for key, value in (filters or {}).items()}
+        n_docs = len(index.docs)
+        if not n_docs:
+            return []
+        avg_length = index.total_length / n_docs
+
+        scores = {}
+        for term in set(terms):
+            postings = index.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * index.lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        if not terms:
+            # Filters alone list every matching document
+            scores = dict.fromkeys(index.docs, 0.0)
+
+        def matches(doc_id):
+            doc = index.docs[doc_id]
+            return all(str(doc.get(key, "")).lower() == value for key, value in filters.items())
+
+        candidates = ((score, doc_id) for doc_id, score in scores.items() if not filters or matches(doc_id))
+        return [(score, index.docs[doc_id]) for score, doc_id in heapq.nlargest(limit, candidates)]
+
+
+def parse_query(query):
+    """Split 'type:event semester:3 ai workshop' into text and filters."""
+    filters, words = {}, []
+    for word in query.split():
+        key, sep, value = word.partition(":")
+        if sep and key and value:
+            filters[key.lower()] = value
+        else:
+            words.append(word)
+    return " ".join(words), filters
+
+
+def build_documents(data):
+    """One search document per course, faculty member, event, calendar entry and FAQ."""
+    docs = []
+    for semester, courses in data["COURSES"].items():
+        for course in courses:
+            prereqs = " ".join(data["PREREQUISITES"].get(course["code"], []))
+            docs.append({
+                "id": f"course:{course['code']}",
+                "type": "course",
+                "title": f"{course['code']} {course['name']}",
+                "text": f"{data['COURSE_TO_FACULTY'].get(course['code'], '')} {prereqs} {course.get('schedule', '')}",
+                "semester": semester,
+                "code": course["code"],
+            })
+    for key, faculty in data["FACULTY"].items():
+        docs.append({
+            "id": f"faculty:{key}",
+            "type": "faculty",
+            "title": faculty["name"],
+            "text": f"{faculty['designation']} {faculty['dept']} {faculty['email']} {' '.join(faculty['courses'])}",
+        })
+    for event in data["EVENTS"]:
+        docs.append({
+            "id": f"event:{event['id']}",
+            "type": "event",
+            "title": event["name"],
+            "text": f"{event['description']} {event['date']} {event['time']}",
+            "date": event["date"],
+        })
+    for category, events in data["ACADEMIC_CALENDAR"].items():
+        for i, event in enumerate(events):
+            docs.append({
+                "id": f"calendar:{category}:{i}",
+                "type": "calendar",
+                "title": event["name"],
+                "text": f"{event.get('notes', '')} {category.replace('_', ' ')} {event['date']}",
+                "category": category.lower(),
+                "date": event["date"],
+            })
+    for key, answer in data["FAQ"].items():
+        docs.append({"id": f"faq:{key}", "type": "faq", "title": key, "text": answer})
+    return docs
+
+
+def build_search_index(data):
+    index = SearchIndex()
+    index.sync(build_documents(data))
+    return index
+
+
+def benchmark(scale, queries=2000):
+    """Index the catalogue repeated scale times and time builds and queries."""
+    import os
+    import time
+    os.environ.setdefault("CHATBOT_TRANSCRIPT", "off")
+    os.environ.setdefault("CHATBOT_REMINDERS", "off")
+    from app import DATA
+
+    base = build_documents(DATA)
+    docs = [dict(doc, id=f"{doc['id']}#{copy}") for copy in range(scale) for doc in base]
+
+    started = time.perf_counter()
+    index = SearchIndex()
+    index.sync(docs)
+    build = time.perf_counter() - started
+
+    samples = ["data structures", "ai workshop", "add drop deadline", "library", "dr sana",
+               "operating systems type:course", "exam type:calendar", "algorithms semester:6"]
+    started = time.perf_counter()
+    for i in range(queries):
+        text, filters = parse_query(samples[i % len(samples)])
+        index.search(text, filters)
+    per_query = (time.perf_counter() - started) / queries
+
+    changed = [dict(doc, text=doc["text"] + " updated") for doc in docs[:100]]
+    started = time.perf_counter()
+    for doc in changed:
+        index.add(doc)
+    update = (time.perf_counter() - started) / len(changed)
+
+    print(f"documents        {len(docs):,} ({scale}x {len(base)})")
+    print(f"terms            {len(index.postings):,}")
+    print(f"full build       {build * 1000:.1f} ms")
+    print(f"query            {per_query * 1000:.3f} ms avg over {queries}")
+    print(f"document update  {update * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the catalogue search index.")
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    benchmark(args.scale, args.queries)
@@ -0,0 +1,216 @@
+"""
+Shadow evaluation of candidate classifiers on live traffic.
+
+A sampled fraction of messages is queued together with the label
+production routing gave them. Background worker threads run every
+candidate registered for that stream ("fsm", "faq", ...) on the same
+input and record agreement with production and latency; only labels
+and counts are kept, never message text. Candidates never affect
+replies. The request path pays one random draw and a
+put_nowait; when the queue is full the sample is dropped and counted.
+
+    python shadow.py --turns 20000    # replay simulator traffic offline
+"""
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class CandidateStats:
+    """Agreement, errors and a latency reservoir for one candidate."""
+
+    def __init__(self, reservoir=2000):
+        self.samples = 0
+        self.agreed = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=reservoir)
+        self.confusion = Counter()               # (production, candidate) -> count
+
+    def summary(self):
+        latencies = list(self.latencies)
+        return {
+            "samples": self.samples,
+            "agreement": self.agreed / self.samples if self.samples else None,
+            "errors": self.errors,
+            "latency_us": {
+                "p50": percentile(latencies, 50) * 1e6,
+                "p95": percentile(latencies, 95) * 1e6,
+                "max": max(latencies, default=0.0) * 1e6,
+            },
+            "top_disagreements": [
+                {"production": p, "candidate": c, "count": n}
+                for (p, c), n in self.confusion.most_common(5)
+            ],
+        }
+
+
+class ShadowEvaluator:
+    """
+    candidates: {stream: {name: fn(text) -> label}}
+    production: {stream: fn(text) -> label}, timed on the same worker as
+    a latency baseline for the candidates.
+    """
+
+    def __init__(self, candidates, production=None, sample_rate=0.1, max_queue=1000, workers=2, seed=None):
+        self.candidates = candidates
+        self.production = production or {}
+        self.sample_rate = sample_rate
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats_by = {
+            (stream, name): CandidateStats()
+            for stream, named in candidates.items()
+            for name in list(named) + (["production"] if stream in self.production else [])
+        }
+        self.seen = 0
+        self.sampled = 0
+        self.dropped = 0
+        self.threads = [
+            threading.Thread(target=self._run, name=f"shadow-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def observe(self, stream, text, label):
+        """Maybe queue one production decision for comparison. Never blocks."""
+        if stream not in self.candidates:
+            return
+        with self.lock:
+            self.seen += 1
+        if self.rng.random() >= self.sample_rate:
+            return
+        try:
+            self.queue.put_nowait((stream, text, label))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return
+        with self.lock:
+            self.sampled += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            stream, text, label = item
+            runs = list(self.candidates[stream].items())
+            if stream in self.production:
+                runs.append(("production", self.production[stream]))
+            for name, classify in runs:
+                started = time.perf_counter()
+                try:
+                    result, error = classify(text), False
+                except Exception:
+                    result, error = None, True
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    stats = self.stats_by[(stream, name)]
+                    stats.samples += 1
+                    stats.latencies.append(elapsed)
+                    if error:
+                        stats.errors += 1
+                    elif result == label:
+                        stats.agreed += 1
+                    else:
+                        stats.confusion[(_short(label), _short(result))] += 1
+            self.queue.task_done()
+
+    def drain(self):
+        """Wait until every queued sample is evaluated (offline replays)."""
+        self.queue.join()
+
+    def stats(self):
+        with self.lock:
+            streams = {}
+            for (stream, name), stats in self.stats_by.items():
+                streams.setdefault(stream, {})[name] = stats.summary()
+            return {
+                "seen": self.seen,
+                "sampled": self.sampled,
+                "dropped": self.dropped,
+                "queued": self.queue.qsize(),
+                "sample_rate": self.sample_rate,
+                "streams": streams,
+            }
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+
+def _short(label):
+    """Labels as recorded: FAQ answers are long strings, keep the start."""
+    if isinstance(label, str) and len(label) > 40:
+        return label[:40] + "…"
+    return label
+
+
+def make_evaluator(candidates, production):
+    """
+    Build the evaluator from CHATBOT_SHADOW, the fraction of messages to
+    sample (default 0.1); "off" or 0 disables shadow evaluation.
+    """
+    rate = os.environ.get("CHATBOT_SHADOW", "0.1")
+    if rate == "off" or float(rate) <= 0:
+        return None
+    return ShadowEvaluator(candidates, production, sample_rate=min(float(rate), 1.0))
+
+
+def replay(turns, seed=0):
+    """Run simulator traffic through the app's evaluator at full sampling."""
+    import json
+    os.environ.setdefault("CHATBOT_TRANSCRIPT", "off")
+    os.environ.setdefault("CHATBOT_REMINDERS", "off")
+    os.environ.setdefault("CHATBOT_SHADOW", "off")
+    import app
+    from simulator import grammar_turn, random_turn
+
+    # Offline: sample everything and keep every sample (maxsize 0 is unbounded)
+    evaluator = ShadowEvaluator(app.SHADOW_CANDIDATES, app.SHADOW_PRODUCTION, sample_rate=1.0, max_queue=0)
+    rng = random.Random(seed)
+    messages = [grammar_turn(rng) if rng.random() < 0.8 else random_turn(rng) for _ in range(turns)]
+
+    labelled = [(message, app.FSM.classify(message), app.check_faq(message)) for message in messages]
+
+    def observe_all(target):
+        started = time.perf_counter()
+        for message, state, faq in labelled:
+            target.observe("fsm", message, state)
+            target.observe("faq", message, faq)
+        return (time.perf_counter() - started) / (2 * turns)
+
+    live = ShadowEvaluator(app.SHADOW_CANDIDATES, app.SHADOW_PRODUCTION)   # Default 10% sampling
+    live_cost = observe_all(live)
+    live.close()
+    full_cost = observe_all(evaluator)
+    evaluator.drain()
+
+    stats = evaluator.stats()
+    for stream, named in stats["streams"].items():
+        for name, summary in named.items():
+            print(f"{stream}/{name}: {json.dumps(summary, default=str)}")
+    print(f"observe() on the request path: {live_cost * 1e6:.2f} us at 10% sampling, "
+          f"{full_cost * 1e6:.2f} us at 100%")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay simulator traffic through the shadow candidates.")
+    parser.add_argument("--turns", type=int, default=20000)
+    args = parser.parse_args()
+    replay(args.turns)
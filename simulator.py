@@ -0,0 +1,185 @@
+"""
+Synthetic conversation simulator for the FSM/PDA engine.
+
+Drives handle_message() directly, without HTTP or sessions, across a
+process pool. Conversations are either grammar-based (realistic turns
+built from the catalogue) or random word salad. Reports FSM state and
+transition coverage, PDA stack depth, stuck contexts, errors and raw
+turns per second.
+
+    python simulator.py --conversations 200000 --workers 8
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("CHATBOT_TRANSCRIPT", "off")
+os.environ.setdefault("CHATBOT_REMINDERS", "off")
+os.environ.setdefault("CHATBOT_SHADOW", "off")
+
+import app  # noqa: E402  (needs the env default above)
+from fsm import FSM  # noqa: E402
+from pda import PDA  # noqa: E402
+
+NAMES = ["Ali", "Sara", "Hamza", "Ayesha", "Usman", "Fatima"]
+DEPTS = ["Computer Science", "CS", "Software Engineering", "Data Science"]
+DAYS = ["Monday", "tue", "Wednesday", "thursday", "Fri", "saturday"]
+CODES = sorted(app.DATA["PREREQUISITES"])
+FACULTY = [f["name"] for f in app.DATA["FACULTY"].values()]
+EVENTS = [e["name"] for e in app.DATA["EVENTS"]]
+NOISE = ["asdf", "what", "ok", "hmm", "thanks", "?", "tell me more", "yes", "no", "42", "eleven"]
+STUCK_REPROMPTS = 3   # Reprompts in a row that count as stuck
+
+
+def grammar_turn(rng):
+    """One user message from the query grammar."""
+    sem = rng.randint(1, 9)   # 9 is deliberately out of range
+    code = rng.choice(CODES)
+    templates = [
+        lambda: f"show semester {sem} courses",
+        lambda: rng.choice(["courses", "what subjects are there", "list my classes"]),
+        lambda: f"who teaches semester {sem}",
+        lambda: f"tell me about {rng.choice(FACULTY)}",
+        lambda: rng.choice(["faculty", "show all professors"]),
+        lambda: f"prerequisites for {code}",
+        lambda: rng.choice(["prereqs", "what are the prerequisites"]),
+        lambda: rng.choice(["events", "what's happening", "upcoming activities"]),
+        lambda: rng.choice(EVENTS),
+        lambda: rng.choice(["how do I calculate gpa", "gpa"]),
+        lambda: rng.choice(["library timings", "campus timings", "admission requirements", "holidays"]),
+        lambda: "academic calendar",
+        lambda: f"do {code} and {rng.choice(CODES)} clash",
+        lambda: f"what's free {rng.choice(DAYS)} {rng.randint(1, 4)}-{rng.randint(5, 6)}pm",
+        lambda: f"build me a clash-free schedule for semester {sem}",
+        lambda: f"courses and who teaches semester {sem}",
+        lambda: rng.choice(["what should I take next", f"recommend courses for semester {sem}"]),
+        lambda: str(sem),
+        lambda: code,
+        lambda: rng.choice(NOISE),
+    ]
+    return rng.choice(templates)()
+
+
+def random_turn(rng):
+    """Word salad from the bot's own vocabulary and noise."""
+    vocab = ["course", "semester", "faculty", "event", "gpa", "prereq", "and", "hi", "free",
+             "clash", "schedule", "library", "3", "9", "CSC201", "teach", "calendar"] + NOISE
+    return " ".join(rng.choice(vocab) for _ in range(rng.randint(1, 6)))
+
+
+def run_conversations(seed, count, max_turns, random_share):
+    """Run count conversations in this process and return raw counters."""
+    rng = random.Random(seed)
+    stats = {
+        "turns": 0,
+        "states": Counter(),
+        "transitions": Counter(),
+        "contexts": Counter(),
+        "reply_types": Counter(),
+        "stack_depth": Counter(),
+        "stuck": Counter(),
+        "abandoned": Counter(),
+        "errors": Counter(),
+        "seconds": 0.0,
+    }
+    for _ in range(count):
+        store, fsm, pda = {}, FSM(), PDA()
+        use_random = rng.random() < random_share
+        script = [rng.choice(["hi", "hello", "hey there"]), rng.choice(NAMES), rng.choice(DEPTS)]
+        script += [
+            random_turn(rng) if use_random else grammar_turn(rng)
+            for _ in range(rng.randint(1, max_turns))
+        ]
+        if rng.random() < 0.5:
+            script.append("bye")
+
+        prev_state = fsm.state
+        reprompts = 0
+        started = time.perf_counter()
+        for message in script:
+            reply, reply_type = app.handle_message(store, fsm, pda, message)
+            # A goodbye resets the FSM to START, record it as GOODBYE like analytics does
+            state = "GOODBYE" if reply_type == "goodbye" else fsm.state
+            stats["turns"] += 1
+            stats["reply_types"][reply_type] += 1
+            stats["states"][state] += 1
+            stats["transitions"][(prev_state, state)] += 1
+            stats["stack_depth"][len(pda.stack)] += 1
+            for item in pda.stack:
+                stats["contexts"][item] += 1
+            if reply_type == "error" or reply is None:
+                stats["errors"][message if len(stats["errors"]) < 50 else "..."] += 1
+            reprompts = reprompts + 1 if reply_type == "reprompt" else 0
+            if reprompts == STUCK_REPROMPTS:
+                stats["stuck"][pda.top()] += 1
+            prev_state = state
+        stats["seconds"] += time.perf_counter() - started
+        if pda.top() and pda.top().startswith("NEED_"):
+            stats["abandoned"][pda.top()] += 1
+    return stats
+
+
+def merge(total, part):
+    for key, value in part.items():
+        if key in total:
+            total[key] += value
+        else:
+            total[key] = value
+    return total
+
+
+def report(stats, wall):
+    states = FSM.STATES
+    seen_states = [s for s in states if stats["states"][s]]
+    possible = len(states) ** 2
+    print(f"conversations turns      {stats['turns']:,}")
+    print(f"wall time                {wall:.2f}s")
+    print(f"engine turns/sec         {stats['turns'] / stats['seconds']:,.0f} per worker")
+    print(f"overall turns/sec        {stats['turns'] / wall:,.0f}")
+    print(f"state coverage           {len(seen_states)}/{len(states)}  missing: {[s for s in states if s not in seen_states]}")
+    print(f"transition coverage      {len(stats['transitions'])}/{possible}")
+    print(f"pda contexts seen        {dict(stats['contexts'])}")
+    print(f"reply types              {dict(stats['reply_types'].most_common())}")
+    print(f"stack depth distribution {dict(sorted(stats['stack_depth'].items()))}")
+    print(f"stuck contexts (≥{STUCK_REPROMPTS} reprompts) {dict(stats['stuck'])}")
+    print(f"abandoned contexts       {dict(stats['abandoned'])}")
+    print(f"errors                   {sum(stats['errors'].values())} {dict(stats['errors'].most_common(5))}")
+    missing = [(a, b) for a in states for b in states if (a, b) not in stats["transitions"]]
+    print(f"never-seen transitions   {len(missing)} e.g. {missing[:6]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-turns", type=int, default=12)
+    parser.add_argument("--random-share", type=float, default=0.2, help="fraction of word-salad conversations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=2000, help="conversations per task")
+    args = parser.parse_args()
+
+    chunks = []
+    remaining, seed = args.conversations, args.seed
+    while remaining > 0:
+        size = min(args.chunk, remaining)
+        chunks.append((seed, size, args.max_turns, args.random_share))
+        remaining -= size
+        seed += 1
+
+    started = time.perf_counter()
+    total = {}
+    if args.workers <= 1:
+        for chunk in chunks:
+            merge(total, run_conversations(*chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for part in pool.map(run_conversations, *zip(*chunks)):
+                merge(total, part)
+    report(total, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
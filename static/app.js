@@ -0,0 +1,243 @@
+function updateFSMDisplay(data) {
+  const currentStateEl = document.getElementById("current-state");
+  const historyEl = document.getElementById("state-history");
+
+  currentStateEl.textContent = data.current_state;
+
+  if (data.history) {
+    historyEl.innerHTML = data.history
+      .slice()
+      .reverse()
+      .map(
+        (s, i) =>
+          `<div class="state-item">${s}${i === 0 ? " (Current)" : ""}</div>`
+      )
+      .join("");
+  }
+}
+
+function updatePDADisplay(data) {
+  pdaStack = data.stack || [];
+  const stackEl = document.getElementById("pda-stack");
+  const opsEl = document.getElementById("pda-operations");
+
+  if (!data.stack || data.stack.length === 0) {
+    stackEl.innerHTML = `<div class="stack-empty">Stack is empty</div>`;
+  } else {
+    stackEl.innerHTML = data.stack
+      .map((item) => `<div class="stack-item">${item}</div>`)
+      .join("");
+  }
+
+  if (data.operation) {
+    const opDiv = document.createElement("div");
+    opDiv.className = `operation ${data.operation.type}`;
+    opDiv.textContent = data.operation.text;
+    opsEl.prepend(opDiv);
+
+    if (opsEl.children.length > 10) {
+      opsEl.removeChild(opsEl.lastChild);
+    }
+  }
+}
+
+async function updateMonitors() {
+  const fsmRes = await fetch("/get_fsm_history");
+  const fsmData = await fsmRes.json();
+  updateFSMDisplay(fsmData);
+
+  const pdaRes = await fetch("/get_pda_state");
+  const pdaData = await pdaRes.json();
+  updatePDADisplay(pdaData);
+}
+
+// ---------- Local answers ----------
+// Context-free replies come from a pre-rendered, immutable bundle.
+// Only used once onboarding is done and no PDA context is pending.
+const BUNDLE_URL = document.body.dataset.bundleUrl;
+const NOT_ONBOARDED = ["ask_name", "ask_dept", "goodbye"];
+let bundle = null;
+let onboarded = false;
+let pdaStack = [];
+
+fetch(BUNDLE_URL)
+  .then((res) => res.json())
+  .then((data) => {
+    data.compiled = data.patterns.map(([re, key]) => [new RegExp(re, "i"), key]);
+    bundle = data;
+  })
+  .catch(() => {});
+
+function localAnswer(message) {
+  if (!bundle || !onboarded || pdaStack.length) return null;
+  const text = message.trim().replace(/\s+/g, " ");
+  for (const [re, key] of bundle.compiled) {
+    const match = text.match(re);
+    if (match) return bundle.answers[key.replace("{1}", match[1])] || null;
+  }
+  return null;
+}
+
+function trackReply(data) {
+  if (data.reply_type) onboarded = !NOT_ONBOARDED.includes(data.reply_type);
+}
+
+const USE_WEBSOCKET = document.body.dataset.websocket === "true";
+let socket = null;
+let pendingReply = null;
+// Last local-answer report; /chat waits for it so the session cookie
+// writes stay in order
+let historySync = Promise.resolve();
+
+function connectSocket() {
+  const scheme = location.protocol === "https:" ? "wss" : "ws";
+  const ws = new WebSocket(`${scheme}://${location.host}/ws`);
+
+  ws.onopen = () => { socket = ws; };
+  ws.onclose = () => {
+    socket = null;
+    if (pendingReply) {
+      pendingReply({ reply: "Connection lost. Please send your message again." });
+      pendingReply = null;
+    }
+  };
+  ws.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    if (data.type !== "reply") return;
+    if (data.state) {
+      updateFSMDisplay(data.state);
+      updatePDADisplay(data.state);
+    }
+    if (pendingReply) {
+      pendingReply(data);
+      pendingReply = null;
+    }
+  };
+}
+
+function sendOverSocket(message) {
+  return new Promise((resolve) => {
+    pendingReply = resolve;
+    socket.send(JSON.stringify({ message }));
+  });
+}
+
+// Answered from the bundle: tell the server so it stays in the history
+function reportLocalAnswer(message) {
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify({ type: "history", message }));
+    return;
+  }
+  historySync = fetch("/history", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ message }),
+  }).then(updateMonitors).catch(() => {});
+}
+
+async function sendOverHttp(message) {
+  await historySync;
+  const res = await fetch("/chat", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ message }),
+  });
+  const data = await res.json();
+  updateMonitors();
+  return data;
+}
+
+document.getElementById("message-form").addEventListener("submit", async (e) => {
+  e.preventDefault();
+
+  const input = document.getElementById("message-input");
+  const message = input.value.trim();
+  if (!message) return;
+
+  const chatBox = document.getElementById("chat-box");
+
+  chatBox.innerHTML += `<div class="message user-message"><p>${message}</p></div>`;
+  input.value = "";
+
+  const local = localAnswer(message);
+  if (local) {
+    chatBox.innerHTML += `<div class="message bot-message"><p>${local}</p></div>`;
+    chatBox.scrollTop = chatBox.scrollHeight;
+    reportLocalAnswer(message);
+    return;
+  }
+
+  const typing = document.createElement("div");
+  typing.className = "message bot-message typing";
+  typing.innerHTML = "<p>Typing...</p>";
+  chatBox.appendChild(typing);
+  chatBox.scrollTop = chatBox.scrollHeight;
+
+  const data = socket && socket.readyState === WebSocket.OPEN
+    ? await sendOverSocket(message)
+    : await sendOverHttp(message);
+  chatBox.removeChild(typing);
+  trackReply(data);
+
+  chatBox.innerHTML += `<div class="message bot-message"><p>${data.reply}</p></div>`;
+  chatBox.scrollTop = chatBox.scrollHeight;
+});
+
+
+// ---------- Typeahead ----------
+const messageInput = document.getElementById("message-input");
+const suggestionsEl = document.getElementById("suggestions");
+let suggestTimer = null;
+let suggestSeq = 0;
+
+function hideSuggestions() {
+  suggestionsEl.innerHTML = "";
+  suggestionsEl.style.display = "none";
+}
+
+function showSuggestions(query, items) {
+  if (!items.length) return hideSuggestions();
+  suggestionsEl.innerHTML = "";
+  items.forEach((item) => {
+    const div = document.createElement("div");
+    div.className = "suggestion";
+    div.innerHTML = `<span class="suggestion-type">${item.type}</span>`;
+    div.appendChild(document.createTextNode(item.label));
+    div.addEventListener("mousedown", (e) => {
+      e.preventDefault();
+      const text = messageInput.value;
+      const at = text.toLowerCase().lastIndexOf(query.split(" ")[0].toLowerCase());
+      messageInput.value = (at >= 0 ? text.slice(0, at) : "") + item.value + " ";
+      hideSuggestions();
+      messageInput.focus();
+    });
+    suggestionsEl.appendChild(div);
+  });
+  suggestionsEl.style.display = "block";
+}
+
+messageInput.addEventListener("input", () => {
+  clearTimeout(suggestTimer);
+  const q = messageInput.value.trim();
+  if (q.length < 2) return hideSuggestions();
+  suggestTimer = setTimeout(async () => {
+    const seq = ++suggestSeq;
+    const res = await fetch(`/autocomplete?q=${encodeURIComponent(q)}`);
+    const data = await res.json();
+    if (seq === suggestSeq) showSuggestions(data.query, data.suggestions);
+  }, 150);
+});
+
+messageInput.addEventListener("blur", hideSuggestions);
+document.getElementById("message-form").addEventListener("submit", () => {
+  clearTimeout(suggestTimer);
+  suggestSeq++;
+  hideSuggestions();
+});
+
+// ---------- Startup ----------
+// The page itself is cached, so each load starts a fresh conversation here
+fetch("/reset", { method: "POST" }).then(() => {
+  if (USE_WEBSOCKET) connectSocket();
+  updateMonitors();
+});
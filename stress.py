@@ -0,0 +1,138 @@
+"""
+Concurrency stress test for threaded workers.
+
+Replays the same seeded conversations single-threaded and then from
+1, 2, 4, ... threads sharing one app module, and checks that every
+reply matches the single-threaded run and that the shared catalogue
+(DATA, search and typeahead indexes) is unchanged afterwards. Reports
+turns per second per thread count; turns are CPU-bound, so throughput
+only scales with threads on a free-threaded build (python3.13t with
+PYTHON_GIL=0).
+
+    python stress.py --conversations 2000 --threads 1,2,4,8
+    python stress.py --http     # through /chat, sessions and cookies
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault("CHATBOT_TRANSCRIPT", "off")
+os.environ.setdefault("CHATBOT_REMINDERS", "off")
+os.environ.setdefault("CHATBOT_SHADOW", "off")
+
+import app  # noqa: E402  (needs the env default above)
+from fsm import FSM  # noqa: E402
+from pda import PDA  # noqa: E402
+from simulator import NAMES, DEPTS, grammar_turn  # noqa: E402
+
+
+def make_scripts(seed, count, max_turns):
+    rng = random.Random(seed)
+    scripts = []
+    for _ in range(count):
+        script = [rng.choice(["hi", "hello"]), rng.choice(NAMES), rng.choice(DEPTS)]
+        script += [grammar_turn(rng) for _ in range(rng.randint(1, max_turns))]
+        scripts.append(script)
+    return scripts
+
+
+def run_engine(script):
+    """Replies for one conversation through handle_message."""
+    store, fsm, pda = {}, FSM(), PDA()
+    replies = []
+    for message in script:
+        reply, reply_type = app.handle_message(store, fsm, pda, message)
+        # Goodbyes are picked at random, compare only their type
+        replies.append((reply_type, None if reply_type == "goodbye" else reply, tuple(pda.stack), fsm.state))
+    return replies
+
+
+def run_http(script):
+    """Replies for one conversation through /chat with its own cookie jar."""
+    client = app.app.test_client()
+    client.get("/")
+    replies = []
+    for message in script:
+        data = client.post("/chat", json={"message": message}).get_json()
+        stack = client.get("/get_pda_state").get_json()["stack"]
+        reply_type = data["reply_type"]
+        replies.append((reply_type, None if reply_type == "goodbye" else data["reply"], tuple(stack)))
+    return replies
+
+
+def fingerprint():
+    """Hash of the shared read-only state, to detect corruption."""
+    parts = [repr(app.DATA[key]) for key in sorted(app.DATA) if key != "TIMETABLE"]
+    parts.append(repr(app.DATA["TIMETABLE"].slots))
+    parts.append(repr(app.PROTECTED_NAMES))
+    parts.append(repr((app.AUTOCOMPLETE.keys, app.AUTOCOMPLETE.entries)))
+    parts.append(repr(sorted((term, sorted(p.items())) for term, p in app.SEARCH.postings.items())))
+    parts.append(app.BUNDLE_DIGEST)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def run_threads(run, scripts, expected, threads):
+    """Split scripts over threads; returns (seconds, turns, mismatches)."""
+    mismatches = []
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for i in range(offset, len(scripts), threads):
+            if run(scripts[i]) != expected[i]:
+                mismatches.append(i)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    seconds = time.perf_counter() - started
+    return seconds, sum(len(script) for script in scripts), mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--max-turns", type=int, default=10)
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--http", action="store_true", help="go through /chat instead of handle_message")
+    args = parser.parse_args()
+
+    run = run_http if args.http else run_engine
+    if args.http:
+        app.RATE_LIMITER.session_burst = app.RATE_LIMITER.ip_burst = 10 ** 9
+        app.ADMISSION.max_inflight = 10 ** 9
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, "
+          f"{'http' if args.http else 'engine'} mode")
+
+    scripts = make_scripts(args.seed, args.conversations, args.max_turns)
+    before = fingerprint()
+    expected = [run(script) for script in scripts]
+
+    base = None
+    failed = False
+    for threads in (int(n) for n in args.threads.split(",")):
+        seconds, turns, mismatches = run_threads(run, scripts, expected, threads)
+        rate = turns / seconds
+        base = base or rate
+        failed |= bool(mismatches)
+        print(f"threads {threads:>3}  {rate:>10,.0f} turns/s  speedup {rate / base:>5.2f}x  "
+              f"mismatched conversations {len(mismatches)}")
+
+    intact = fingerprint() == before
+    print(f"shared state intact      {intact}")
+    sys.exit(0 if intact and not failed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat")
+DAY_NAMES = {
+    "mon": "Mon", "monday": "Mon", "tue": "Tue", "tues": "Tue", "tuesday": "Tue",
+    "wed": "Wed", "wednesday": "Wed", "thu": "Thu", "thur": "Thu", "thurs": "Thu",
+    "thursday": "Thu", "fri": "Fri", "friday": "Fri", "sat": "Sat", "saturday": "Sat",
+}
+
+DAY_START = 8 * 60   # Bitmask grid covers 08:00–20:00 in 30 minute cells
+DAY_END = 20 * 60
+CELL = 30
+CELLS_PER_DAY = (DAY_END - DAY_START) // CELL
+
+
+def to_minutes(hhmm):
+    """'14:30' -> 870"""
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes):
+    """870 -> '2:30 PM'"""
+    hours, minutes = divmod(minutes, 60)
+    suffix = "AM" if hours < 12 else "PM"
+    return f"{(hours - 1) % 12 + 1}:{minutes:02d} {suffix}"
+
+
+class IntervalTree:
+    """
+    Static augmented interval tree over half-open [start, end) intervals.
+    Intervals are kept sorted by start in an implicit balanced tree; each
+    node stores the largest end in its subtree so whole subtrees that end
+    before the query are skipped. Overlap queries are O(log n + k).
+    """
+
+    def __init__(self, intervals):
+        self.items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.max_end = [0] * len(self.items)
+        self._build(0, len(self.items))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return 0
+        mid = (lo + hi) // 2
+        self.max_end[mid] = max(self.items[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        return self.max_end[mid]
+
+    def overlapping(self, start, end):
+        """Payloads of every interval overlapping [start, end)."""
+        found = []
+        self._query(0, len(self.items), start, end, found)
+        return found
+
+    def _query(self, lo, hi, start, end, found):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self.max_end[mid] <= start:
+            return  # Everything under this node ends before the query
+        self._query(lo, mid, start, end, found)
+        item_start, item_end, payload = self.items[mid]
+        if item_start >= end:
+            return  # This node and its right subtree start after the query
+        if item_end > start:
+            found.append(payload)
+        self._query(mid + 1, hi, start, end, found)
+
+
+class Timetable:
+    """
+    Weekly timetable of course sections.
+    Keeps one interval tree per day and per (room, day), and a bitmask of
+    occupied 30 minute cells per section for fast clash checks.
+    """
+
+    def __init__(self, slots):
+        # slots: dicts with course, section, day, start, end (minutes), room
+        self.slots = list(slots)
+        self.sections = {}   # course -> section -> [slot, ...]
+        self.rooms = sorted({slot["room"] for slot in self.slots})
+        by_day, by_room = {}, {}
+        for slot in self.slots:
+            self.sections.setdefault(slot["course"], {}).setdefault(slot["section"], []).append(slot)
+            interval = (slot["start"], slot["end"], slot)
+            by_day.setdefault(slot["day"], []).append(interval)
+            by_room.setdefault((slot["room"], slot["day"]), []).append(interval)
+        self.by_day = {day: IntervalTree(items) for day, items in by_day.items()}
+        self.by_room = {key: IntervalTree(items) for key, items in by_room.items()}
+        self.masks = {
+            (course, section): self._mask(section_slots)
+            for course, sections in self.sections.items()
+            for section, section_slots in sections.items()
+        }
+
+    @staticmethod
+    def _mask(slots):
+        mask = 0
+        for slot in slots:
+            base = DAYS.index(slot["day"]) * CELLS_PER_DAY
+            first = max(0, (slot["start"] - DAY_START) // CELL)
+            last = min(CELLS_PER_DAY, -(-(slot["end"] - DAY_START) // CELL))
+            for cell in range(first, last):
+                mask |= 1 << (base + cell)
+        return mask
+
+    def schedule_of(self, course):
+        """'A: Mon/Wed 8:30 AM–10:00 AM (Room 106)' style summary, or None."""
+        sections = self.sections.get(course)
+        if not sections:
+            return None
+        lines = []
+        for section, slots in sorted(sections.items()):
+            parts = [
+                f"{slot['day']} {format_minutes(slot['start'])}–{format_minutes(slot['end'])} ({slot['room']})"
+                for slot in sorted(slots, key=lambda s: (DAYS.index(s["day"]), s["start"]))
+            ]
+            lines.append(f"{section}: " + ", ".join(parts))
+        return "; ".join(lines)
+
+    def clashes(self, course_a, course_b):
+        """
+        Overlapping meetings between every section pair of two courses.
+        Returns {(section_a, section_b): [(slot_a, slot_b), ...]} for
+        pairs that clash; pairs missing from the dict are compatible.
+        """
+        result = {}
+        for section_a, slots_a in self.sections.get(course_a, {}).items():
+            for section_b in self.sections.get(course_b, {}):
+                if not self.masks[(course_a, section_a)] & self.masks[(course_b, section_b)]:
+                    continue
+                pairs = []
+                for slot_a in slots_a:
+                    tree = self.by_day.get(slot_a["day"])
+                    for slot_b in tree.overlapping(slot_a["start"], slot_a["end"]) if tree else []:
+                        if slot_b["course"] == course_b and slot_b["section"] == section_b:
+                            pairs.append((slot_a, slot_b))
+                if pairs:
+                    result[(section_a, section_b)] = pairs
+        return result
+
+    def busy(self, day, start, end):
+        """Every meeting overlapping the window on that day."""
+        tree = self.by_day.get(day)
+        return tree.overlapping(start, end) if tree else []
+
+    def free_rooms(self, day, start, end):
+        """Rooms with no meeting overlapping the window on that day."""
+        return [
+            room for room in self.rooms
+            if (room, day) not in self.by_room or not self.by_room[(room, day)].overlapping(start, end)
+        ]
+
+    def build_schedule(self, courses, max_nodes=20000):
+        """
+        Pick one section per course so that no two meetings overlap.
+        Backtracking over bitmasks, courses with the fewest sections first,
+        pruning branches that cannot beat the best partial schedule. When
+        no full schedule exists the search stops after max_nodes and keeps
+        the best partial one, so replies stay interactive.
+        Returns (chosen {course: section}, unscheduled [course, ...]).
+        """
+        courses = sorted(
+            (c for c in courses if c in self.sections),
+            key=lambda c: len(self.sections[c]),
+        )
+        options = [
+            [(section, self.masks[(course, section)]) for section in sorted(self.sections[course])]
+            for course in courses
+        ]
+        best = {"chosen": {}, "count": -1, "nodes": 0}
+
+        def search(index, used, chosen):
+            best["nodes"] += 1
+            if best["nodes"] > max_nodes:
+                return True  # Out of budget, keep the best found
+            # Upper bound: courses left that still have a section that fits
+            reachable = sum(
+                1 for course_options in options[index:]
+                if any(not used & mask for _, mask in course_options)
+            )
+            if len(chosen) + reachable <= best["count"]:
+                return False  # Cannot beat the best found so far
+            if index == len(courses):
+                best["chosen"], best["count"] = dict(chosen), len(chosen)
+                return len(chosen) == len(courses)
+            fits = [(section, mask) for section, mask in options[index] if not used & mask]
+            for section, mask in fits:
+                chosen[courses[index]] = section
+                if search(index + 1, used | mask, chosen):
+                    return True
+                del chosen[courses[index]]
+            # Leave this course out and schedule the rest
+            return search(index + 1, used, chosen)
+
+        search(0, 0, {})
+        chosen = best["chosen"]
+        return chosen, [c for c in courses if c not in chosen]
+
+
+def build_timetable(timetable_raw):
+    """Expand ("CSC101", "A", "Mon/Wed", "08:30", "10:00", "Room 101") rows into slots."""
+    slots = []
+    for course, section, days, start, end, room in timetable_raw:
+        for day in days.split("/"):
+            slots.append({
+                "course": course,
+                "section": section,
+                "day": day,
+                "start": to_minutes(start),
+                "end": to_minutes(end),
+                "room": room,
+            })
+    return Timetable(slots)
@@ -0,0 +1,218 @@
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+
+class SQLiteSink:
+    """Batch-inserts turn records into a SQLite table."""
+
+    COLUMNS = ("ts", "session_id", "message", "fsm_state", "pda_stack", "reply_type", "latency_ms", "status")
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+
+    def open(self):
+        # Opened on the writer thread, SQLite connections stay on their thread
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, session_id TEXT, message TEXT, "
+            "fsm_state TEXT, pda_stack TEXT, reply_type TEXT, latency_ms REAL, status INTEGER)"
+        )
+        self.conn.commit()
+
+    def write(self, records):
+        rows = [
+            tuple(json.dumps(r.get(c)) if c == "pda_stack" else r.get(c) for c in self.COLUMNS)
+            for r in records
+        ]
+        self.conn.executemany(
+            f"INSERT INTO turns ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            rows,
+        )
+        self.conn.commit()
+
+    def tick(self):
+        pass
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class JSONLSink:
+    """
+    Appends turn records to gzip-compressed JSONL segments.
+    A new segment is started once the current one passes max_bytes or
+    max_age seconds; an idle segment is closed by tick() once it is
+    max_age old. Finished segments are never touched again. A .part
+    segment nobody has written to for a while was left by a crashed
+    writer, its readable records are moved into a finished segment.
+    """
+
+    def __init__(self, directory, max_bytes=8 * 1024 * 1024, max_age=300):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.file = None
+        self.written = 0
+        self.opened_at = 0.0
+        self.recovered_at = 0.0
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover()
+
+    def tick(self):
+        """Called by the writer thread between batches."""
+        now = time.monotonic()
+        if self.file is not None and now - self.opened_at >= self.max_age:
+            self.close()
+        if now - self.recovered_at >= self.max_age:
+            self._recover()
+
+    def _recover(self):
+        self.recovered_at = time.monotonic()
+        # Live segments are flushed on every write and closed max_age after
+        # opening, so anything untouched for longer was abandoned
+        stale_before = time.time() - max(2 * self.max_age, 60)
+        current = self.file.name if self.file is not None else None
+        for path in glob.glob(os.path.join(self.directory, "*.jsonl.gz.part")):
+            try:
+                if path == current or os.path.getmtime(path) >= stale_before:
+                    continue
+                claimed = path[: -len(".part")] + ".recovering"
+                os.rename(path, claimed)   # Only one writer wins the rename
+            except OSError:
+                continue
+            records = []
+            try:
+                with gzip.open(claimed, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.endswith("\n"):
+                            records.append(line)
+            except (OSError, EOFError, zlib.error):
+                pass   # Truncated by the crash, keep the complete lines before it
+            finished = path[: -len(".part")]
+            with gzip.open(finished + ".tmp", "wt", encoding="utf-8") as f:
+                f.writelines(records)
+            os.replace(finished + ".tmp", finished)
+            os.remove(claimed)
+            log.warning("Recovered %d records from abandoned segment %s", len(records), path)
+
+    def _rotate(self):
+        self.close()
+        name = time.strftime("transcript-%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000:06d}.jsonl.gz.part"
+        self.file = gzip.open(os.path.join(self.directory, name), "wt", encoding="utf-8")
+        self.written = 0
+        self.opened_at = time.monotonic()
+
+    def write(self, records):
+        if (self.file is None or self.written >= self.max_bytes
+                or time.monotonic() - self.opened_at >= self.max_age):
+            self._rotate()
+        for record in records:
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            self.file.write(line)
+            self.written += len(line)
+        self.file.flush()
+
+    def close(self):
+        """Close the current segment and drop its .part suffix."""
+        if self.file is not None:
+            path = self.file.name
+            self.file.close()
+            os.replace(path, path[: -len(".part")])
+            self.file = None
+
+
+class TranscriptLogger:
+    """
+    Non-blocking transcript logger.
+    log() only does a put_nowait on a bounded queue; a background thread
+    drains it in batches into the sink. When the queue is full the
+    record is dropped and counted instead of slowing the request.
+    """
+
+    def __init__(self, sink, max_queue=10000, batch_size=500, flush_interval=1.0):
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self.lock = threading.Lock()   # dropped is bumped from request threads
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def log(self, record):
+        """Queue one turn record. Never blocks."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def _run(self):
+        self.sink.open()
+        while not (self.stopped.is_set() and self.queue.empty()):
+            try:
+                self.sink.tick()   # Rotates idle segments even without traffic
+            except Exception:
+                log.exception("Transcript segment rotation failed")
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.sink.write(batch)
+                self.written += len(batch)
+            except Exception:
+                with self.lock:
+                    self.dropped += len(batch)
+                log.exception("Transcript writer error, dropped %d records", len(batch))
+        self.sink.close()
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def close(self):
+        """Flush what is queued and stop the writer thread."""
+        if not self.stopped.is_set():
+            self.stopped.set()
+            self.thread.join(timeout=5)
+
+
+def make_logger(default_path):
+    """
+    Build the logger from CHATBOT_TRANSCRIPT.
+    A path ending in .db selects SQLite, any other path a JSONL directory,
+    and "off" disables logging.
+    """
+    path = os.environ.get("CHATBOT_TRANSCRIPT", default_path)
+    if path == "off":
+        return None
+    if path.endswith(".db"):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return TranscriptLogger(SQLiteSink(path))
+    return TranscriptLogger(JSONLSink(path))